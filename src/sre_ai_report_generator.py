@@ -9,19 +9,38 @@
 """
 
 import os
+import argparse
 import requests
+from requests.adapters import HTTPAdapter
 import json
+import gzip
+import html
+import io
+import string
 import time
+import random
+import hashlib
+import sqlite3
+import threading
+from email.utils import parsedate_to_datetime
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
 from datetime import datetime, timedelta
 
-# 外部库导入
+# 外部库导入：sendgrid 只在配置了 SENDGRID_API_KEY 时导入，未启用邮件的运行不加载它及其依赖
+if os.environ.get("SENDGRID_API_KEY"):
+    try:
+        from sendgrid import SendGridAPIClient
+        from sendgrid.helpers.mail import Mail, Personalization, To
+    except ImportError as e:
+        # 已配置 SendGrid 却缺少库时报告无法送达：在任何 Gemini 调用之前直接退出，避免白白消耗 API 配额
+        raise SystemExit(f"Missing required library '{e.name}'. Install with: pip install -r src/requirements.txt")
+
+# 可选加速库：orjson (C/Rust 实现的 JSON 解析)，未安装时回退到标准库 json
 try:
-    from notion_client import Client
-    from sendgrid import SendGridAPIClient
-    from sendgrid.helpers.mail import Mail
+    import orjson
 except ImportError:
-    # 仅作警告，确保脚本在缺少这些库时能执行到配置检查
-    pass
+    orjson = None
 
 # --- Configuration & Environment Variables ---
 
@@ -33,6 +52,8 @@ NOTION_DB_FAILURE_INCIDENTS = os.environ.get("NOTION_DB_FAILURE_INCIDENTS") # 3.
 NOTION_DB_AI_NEWS = os.environ.get("NOTION_DB_AI_NEWS") # 4. AI 前沿资讯 (AI_News)
 NOTION_DB_AI_LEARNING = os.environ.get("NOTION_DB_AI_LEARNING") # 5. AI 学习推荐 (AI_Learning)
 NOTION_DB_AI_BUSINESS = os.environ.get("NOTION_DB_AI_BUSINESS") # 6. AI 商业机会 (AI_Business_Opportunity)
+NOTION_API_URL = "https://api.notion.com/v1/pages"
+NOTION_API_VERSION = "2022-06-28"
 
 # SendGrid Configuration
 SENDGRID_API_KEY = os.environ.get("SENDGRID_API_KEY")
@@ -42,120 +63,569 @@ FROM_EMAIL = GMAIL_RECIPIENT_EMAILS[0] if GMAIL_RECIPIENT_EMAILS else None
 
 # Gemini Configuration
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
+# 默认用一次 Gemini 调用获取全部六个部分，缺失的部分再回退到逐步调用；设为 "0" 时始终逐步调用
+GEMINI_COMBINED_PROMPT = os.environ.get("GEMINI_COMBINED_PROMPT", "1") != "0"
+GEMINI_MODEL = "gemini-2.5-flash"
+GEMINI_API_BASE = "https://generativelanguage.googleapis.com/v1beta"
+# 设为 "0" 时关闭 Google Search Grounding。Gemini 2.5 不支持在使用工具的同时约束 JSON 输出，
+# 因此只有关闭搜索时才启用结构化输出 (responseMimeType + responseSchema)
+GEMINI_GOOGLE_SEARCH = os.environ.get("GEMINI_GOOGLE_SEARCH", "1") != "0"
+GEMINI_TOOLS = [{"google_search": {}}] if GEMINI_GOOGLE_SEARCH else []
+# 设为 "1" 时，响应内容缺失 (空候选/无文本) 后的重试不再联网搜索，以更低延迟换取一次可用响应；
+# 默认关闭，因为不搜索时的资讯和链接无法保证是最新的
+GEMINI_RETRY_WITHOUT_SEARCH = os.environ.get("GEMINI_RETRY_WITHOUT_SEARCH") == "1"
+# 可选的响应字段掩码 (如 "candidates.content.parts.text")：服务端只返回所需字段，
+# 不再传输和解析体积较大的 groundingMetadata。默认不启用
+GEMINI_RESPONSE_FIELDS = os.environ.get("GEMINI_RESPONSE_FIELDS", "")
+# 设为 "1" 时以 gzip 压缩 generateContent 请求体；服务端拒绝 (400/415) 时本次运行自动改回未压缩请求
+GEMINI_GZIP_REQUESTS = os.environ.get("GEMINI_GZIP_REQUESTS") == "1"
+# 本地响应缓存 (SQLite)：同一天内重跑脚本时直接复用已成功解析的 Gemini 响应 (提示词包含运行日期，缓存按天生效)
+GEMINI_CACHE_DB = os.environ.get("GEMINI_CACHE_DB", os.path.expanduser("~/.cache/sre_ai_report/gemini_cache.sqlite"))
+# 设为 "0" 时完全跳过响应缓存 (生产运行强制获取最新内容)
+SRE_AI_CACHE = os.environ.get("SRE_AI_CACHE", "1") != "0"
+# 设为 "1" 时不读取缓存，但仍把新响应写回缓存 (强制刷新)
+FORCE_REFRESH = os.environ.get("FORCE_REFRESH") == "1"
+CACHE_RETENTION_SECONDS = 7 * 24 * 3600 # 超过一周的响应和 Notion 页面记录不会再被命中，每次运行时从缓存文件中清理
+# 设为 "1" 时打印每次成功响应的调试信息 (长度与开头片段)；失败时的完整原文始终打印
+SRE_AI_DEBUG = os.environ.get("SRE_AI_DEBUG") == "1"
+
+# 所有步骤共享的系统提示词。放在请求最前面，使六次调用拥有相同前缀，可命中 Gemini 的隐式缓存。
+# 不使用显式上下文缓存 (cachedContents)：提示词远低于其 1024 token 的最小长度，且合并模式每次运行只调用一次
+SHARED_SYSTEM_PROMPT = """
+你是一名资深的全球 SRE (站点可靠性工程) 运维与人工智能行业分析师，负责为技术团队编写《全球运维与 AI 周报》。
+所有内容必须基于可联网搜索到的最新、真实、可核实的公开信息，优先采用官方博客、官方公告、事故复盘报告和权威媒体。
+
+**【输出格式规则】**
+1. 严格按照用户给出的 JSON 结构返回数据，**不允许添加任何 Markdown 格式 (包括 ```json 代码块) 或额外文本**。
+2. 字段名必须与给定结构完全一致，不允许增删或改名字段；所有字段值均为字符串。
+3. 所有链接字段必须是以 http:// 或 https:// 开头、真实存在且可访问的网页链接。如果找不到可用链接，请不要返回该条记录。
+4. 日期字段使用 YYYY-MM-DD 格式；带时间的字段使用 ISO 8601 Timestamp 格式 (如 YYYY-MM-DDTHH:MM:SSZ)。
+5. 要求逗号分隔字符串的字段 (如 focus_areas、tags) 请使用英文逗号分隔，不要返回数组。
+6. 内容使用简体中文撰写，专有名词、产品名和公司名保留原文。
+""".strip()
+
+# --- Run Timestamp ---
+# 整个运行只读取一次系统时间，报告周期、Schema 示例和各字段的日期默认值都基于它
+RUN_DATE = datetime.now()
+RUN_DATE_STR = RUN_DATE.strftime("%Y-%m-%d")
+REPORT_WEEK_START = (RUN_DATE - timedelta(days=6)).strftime("%Y-%m-%d")
+REPORT_WEEK_END = RUN_DATE_STR
 
 # --- Timing & Robustness Constants ---
-REQUEST_TIMEOUT_SECONDS = 150 
-INITIAL_RETRY_SLEEP = 60 
+# requests 的超时为 (连接, 读取) 二元组：连接卡住时 5 秒内即可进入重试，读取仍允许较长的生成时间
+GEMINI_CONNECT_TIMEOUT = float(os.environ.get("GEMINI_CONNECT_TIMEOUT", "5"))
+GEMINI_READ_TIMEOUT = float(os.environ.get("GEMINI_READ_TIMEOUT", "150"))
+GEMINI_TIMEOUT = (GEMINI_CONNECT_TIMEOUT, GEMINI_READ_TIMEOUT)
+NOTION_CONNECT_TIMEOUT = float(os.environ.get("NOTION_CONNECT_TIMEOUT", "5"))
+NOTION_TIMEOUT = (NOTION_CONNECT_TIMEOUT, 30) # Notion 单页写入通常在 1 秒内完成
+INITIAL_RETRY_SLEEP = 2 # 指数退避基数 (秒): 第 n 次重试的等待上限为 2s、4s、8s...
+MAX_RETRY_SLEEP = 60 # 指数退避的等待上限 (秒)
+MIN_RETRY_SLEEP = 1 # 全抖动退避的等待下限 (秒)
+CONTENT_RETRY_SLEEP = 2 # 响应内容缺失/无法解码时的快速重试间隔 (秒)，这类错误与限流无关
 MAX_RETRIES = 3 
+MAX_RATE_LIMIT_SLEEP = 300 # 服务端 Retry-After 提示的等待上限 (秒)
+
+# --- Gemini Adaptive Concurrency (AIMD) ---
+# 并发 Gemini 调用数上限，可通过环境变量按 API 配额 (每分钟请求数) 调低
+GEMINI_MAX_CONCURRENCY = max(1, int(os.environ.get("GEMINI_MAX_CONCURRENCY", "5")))
+GEMINI_AIMD_INCREASE = 0.5 # 成功时加性增加: c = c + 0.5
+GEMINI_AIMD_DECREASE = 0.5 # 429/5xx 时乘性减少: c = c * 0.5
+
+# --- Notion Write Concurrency ---
+NOTION_MAX_CONCURRENCY = 3 # 并发写入的线程数
+NOTION_REQUESTS_PER_SECOND = 3 # Notion API 平均限速为每秒 3 次请求
+NOTION_BURST_SIZE = 3 # 令牌桶容量：空闲后允许立即发出的请求数
+NOTION_MAX_ATTEMPTS = 3 # 单页写入遇到 429 限流时的最多尝试次数
+NOTION_RATE_LIMIT_SLEEP = 1 # 429 响应未带 Retry-After 时的等待 (秒)
+
+# --- Connection Pool Sizes ---
+# requests 只支持 HTTP/1.1，每个并发请求占用一条连接；按各主机的最大并发数设定保活连接数，
+# 使所有并行请求都能复用已握手的连接，而不是在池满后临时新建再丢弃
+HTTP_POOL_CONNECTIONS = 2 # 缓存的目标主机数 (Gemini、Notion)
+HTTP_POOL_MAXSIZE = max(GEMINI_MAX_CONCURRENCY, NOTION_MAX_CONCURRENCY) # 每个主机的最大保活连接数
 
 # --- Initialize Clients ---
-notion = Client(auth=NOTION_TOKEN) if NOTION_TOKEN else None
+# 共享的 HTTP 会话：Gemini 和 Notion 请求复用 TCP+TLS 连接，避免每次调用都重新握手
+# max_retries=0：重试逻辑由 _gemini_api_call 自行控制
+_HTTP = requests.Session()
+_HTTP.mount("https://", HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE, max_retries=0))
+
+# Gemini REST API 地址与请求头：所有调用共用，由 _HTTP 会话的连接池承载
+_GEMINI_GENERATE_URL = f"{GEMINI_API_BASE}/models/{GEMINI_MODEL}:generateContent?key={GEMINI_API_KEY}"
+_GEMINI_HEADERS = { "Content-Type": "application/json" }
+# generateContent 专用请求头 (可选的响应字段掩码只用于生成调用)
+_GEMINI_GENERATE_HEADERS = dict(_GEMINI_HEADERS, **({"X-Goog-FieldMask": GEMINI_RESPONSE_FIELDS} if GEMINI_RESPONSE_FIELDS else {}))
+_GEMINI_GZIP_HEADERS = dict(_GEMINI_GENERATE_HEADERS, **{"Content-Encoding": "gzip"})
+
+# Notion REST API 请求头：页面写入直接走共享会话，不经过 notion_client SDK
+_NOTION_HEADERS = {
+    "Authorization": f"Bearer {NOTION_TOKEN}",
+    "Notion-Version": NOTION_API_VERSION,
+    "Content-Type": "application/json",
+}
+
+# Notion 页面写入线程池，由所有步骤共享，配合 _notion_throttle 控制整体请求速率
+_NOTION_POOL = ThreadPoolExecutor(max_workers=NOTION_MAX_CONCURRENCY, thread_name_prefix="notion")
+_notion_rate_lock = threading.Lock()
+_notion_tokens = float(NOTION_BURST_SIZE)
+_notion_last_refill = time.monotonic()
+_pending_notion_writes = [] # 已提交但尚未确认完成的 Notion 写入
+_pending_writes_lock = threading.Lock()
+_cache_db_ready = False # 本进程是否已完成缓存库的建表与 WAL 设置
+_claimed_pages = set() # 本进程已写入或正在写入的 (db_id, 内容哈希)，同一内容并发提交时只写一次
+
+# 报告邮件在后台线程发送，与仍在进行的 Notion 写入重叠
+_EMAIL_POOL = ThreadPoolExecutor(max_workers=1, thread_name_prefix="email")
+# 失败通知不立即发送，运行结束时合并为一封汇总邮件: 主题 -> [首条详情, 出现次数]
+_pending_failures = {}
+_pending_failures_lock = threading.Lock()
+_sendgrid_client = None # 首次发送邮件时创建，之后复用
+_sendgrid_client_lock = threading.Lock()
+_force_notion_writes = False # --force: 忽略已记录的页面，重新写入全部 Notion 页面
+
+
+class _AIMDLimiter:
+    """Thread-safe concurrency gate: the limit grows additively on success and halves on 429/5xx."""
+
+    def __init__(self, max_concurrency, increase, decrease):
+        self._max = float(max_concurrency)
+        self._limit = float(max_concurrency)
+        self._increase = increase
+        self._decrease = decrease
+        self._active = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self._active >= max(1, int(self._limit)):
+                self._cond.wait()
+            self._active += 1
+
+    def release(self):
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+    def on_success(self):
+        with self._cond:
+            self._limit = min(self._max, self._limit + self._increase)
+            self._cond.notify_all()
+
+    def on_overload(self):
+        with self._cond:
+            self._limit = max(1.0, self._limit * self._decrease)
+            print(f"Gemini overload signalled. Concurrency limit reduced to {int(self._limit)}.")
+
+
+_gemini_limiter = _AIMDLimiter(GEMINI_MAX_CONCURRENCY, GEMINI_AIMD_INCREASE, GEMINI_AIMD_DECREASE)
+_gemini_gzip_enabled = GEMINI_GZIP_REQUESTS # 服务端不接受压缩请求体时置为 False
+
+
+class _TransientAPIError(requests.exceptions.RequestException):
+    """429/5xx from Gemini. Carries the server-suggested wait (seconds), if any."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
 
 
 # --- SendGrid Email Function ---
+def _get_sendgrid_client():
+    """Returns the shared SendGridAPIClient, created on first use (report and failure emails reuse it)."""
+    global _sendgrid_client
+    with _sendgrid_client_lock:
+        if _sendgrid_client is None:
+            _sendgrid_client = SendGridAPIClient(SENDGRID_API_KEY)
+        return _sendgrid_client
+
+def _build_mail(subject, message_text, recipients):
+    """One Mail with one Personalization per recipient (each gets an individual message)."""
+    message = Mail(
+        from_email=FROM_EMAIL,
+        subject=subject,
+        html_content=message_text
+    )
+    for to_email in recipients:
+        personalization = Personalization()
+        personalization.add_to(To(to_email))
+        message.add_personalization(personalization)
+    return message
+
 def send_email_notification(to_list, subject, message_text):
-    """Send an email using the SendGrid API with HTML content."""
+    """Send one HTML email via SendGrid, one Personalization per recipient (per-recipient retry on a 4xx)."""
     if not SENDGRID_API_KEY or not FROM_EMAIL or not to_list:
         print("Email configuration missing (Key, From, or To), skipping email.")
         return
         
+    # 同一地址出现在多个 Personalization 中会导致 SendGrid 拒绝整个请求，按小写地址去重 (保留原顺序)
+    recipients = []
+    seen = set()
+    for to_email in to_list:
+        to_email = to_email.strip()
+        if to_email and to_email.lower() not in seen:
+            seen.add(to_email.lower())
+            recipients.append(to_email)
     try:
-        sg = SendGridAPIClient(SENDGRID_API_KEY)
-        for to_email in to_list:
-            message = Mail(
-                from_email=FROM_EMAIL,
-                to_emails=to_email.strip(),
-                subject=subject,
-                html_content=message_text
-            )
-            sg.send(message)
-            print(f"Successfully sent email to: {to_email.strip()}")
+        sg = _get_sendgrid_client()
+        try:
+            sg.send(_build_mail(subject, message_text, recipients))
+        except Exception as e:
+            # 整批被拒 (4xx，如某个地址格式错误) 时逐个收件人重发，保证有效地址仍能收到
+            status = getattr(e, 'status_code', None)
+            if len(recipients) < 2 or not isinstance(status, int) or not 400 <= status < 500:
+                raise
+            print(f"SendGrid rejected the batched email (Status {status}). Retrying per recipient...")
+            delivered = []
+            for to_email in recipients:
+                try:
+                    sg.send(_build_mail(subject, message_text, [to_email]))
+                    delivered.append(to_email)
+                except Exception as single_error:
+                    print(f"Failed to send email to {to_email}: {single_error}")
+            if not delivered:
+                print(f"Failed to send email via SendGrid: every recipient was rejected (batch status {status}).")
+                return
+            recipients = delivered
+        print(f"Successfully sent email to {len(recipients)} recipient(s): {', '.join(recipients)}")
             
     except Exception as e:
         print(f"Failed to send email via SendGrid: {e}")
 
+def _notify_failure(subject, message_text):
+    """Records a failure for the end-of-run digest; repeats of the same subject are counted."""
+    with _pending_failures_lock:
+        if subject in _pending_failures:
+            _pending_failures[subject][1] += 1
+            print(f"Failure already queued for the digest: {subject}")
+        else:
+            _pending_failures[subject] = [message_text, 1]
+
+def _take_failures():
+    """Removes and returns the failures recorded so far ({subject: [message, count]})."""
+    with _pending_failures_lock:
+        failures = dict(_pending_failures)
+        _pending_failures.clear()
+    return failures
+
+def _restore_failures(failures):
+    """Puts failures taken with _take_failures back into the digest, merging repeat counts."""
+    with _pending_failures_lock:
+        for subject, (message_text, count) in failures.items():
+            if subject in _pending_failures:
+                _pending_failures[subject][1] += count
+            else:
+                _pending_failures[subject] = [message_text, count]
+
+def _send_failure_digest():
+    """Sends every failure recorded during the run as ONE email (no-op when nothing failed)."""
+    with _pending_failures_lock:
+        failures = list(_pending_failures.items())
+        _pending_failures.clear()
+    if not failures:
+        return
+    if len(failures) == 1:
+        digest_subject = failures[0][0]
+    else:
+        digest_subject = f"SRE/AI 报告生成失败 ({len(failures)} 类错误)"
+    body = io.StringIO()
+    for subject, (message_text, count) in failures:
+        repeat_note = f" (×{count})" if count > 1 else ""
+        body.write(f"<h3>{html.escape(subject)}{repeat_note}</h3><pre>{html.escape(message_text)}</pre>")
+    print(f"Sending failure digest with {len(failures)} error type(s).")
+    send_email_notification(GMAIL_RECIPIENT_EMAILS, digest_subject, body.getvalue())
+
 # --- Core Gemini API Call Helper ---
 
-def _gemini_api_call(prompt_text):
-    """
-    Handles API call, request timeout (120s), and exponential backoff retries (60s, 120s...).
-    Returns raw response text or None on failure.
-    """
+def _parse_retry_after(response):
+    """Returns the wait in seconds from 'Retry-After' or 'X-RateLimit-Reset', or None."""
+    retry_after = response.headers.get("Retry-After")
+    if retry_after:
+        try:
+            return min(MAX_RATE_LIMIT_SLEEP, max(0.0, float(retry_after)))
+        except ValueError:
+            try:
+                delay = parsedate_to_datetime(retry_after).timestamp() - time.time()
+                return min(MAX_RATE_LIMIT_SLEEP, max(0.0, delay))
+            except (TypeError, ValueError):
+                pass
+    reset = response.headers.get("X-RateLimit-Reset")
+    if reset:
+        try:
+            reset_value = float(reset)
+        except ValueError:
+            return None
+        # 大于 1e9 视为 Unix 时间戳，否则视为剩余秒数
+        delay = reset_value - time.time() if reset_value > 1e9 else reset_value
+        return min(MAX_RATE_LIMIT_SLEEP, max(0.0, delay))
+    return None
+
+def _build_gemini_request_body(prompt_text, response_schema=None, enable_search=True):
+    """Builds the generateContent body (shared system prompt first; structured output only without search)."""
+    tools = GEMINI_TOOLS if enable_search else []
+    body = {
+        "systemInstruction": {"parts": [{"text": SHARED_SYSTEM_PROMPT}]},
+        "contents": [{"role": "user", "parts": [{"text": prompt_text}]}],
+    }
+    if tools:
+        body["tools"] = tools
+    if response_schema and not tools:
+        body["generationConfig"] = {
+            "responseMimeType": "application/json",
+            "responseSchema": response_schema,
+        }
+    return body
+
+def _gemini_api_call(prompt_text, response_schema=None):
+    """Calls Gemini with retries; returns (raw response text or None, search_dropped)."""
     if not GEMINI_API_KEY:
         print("GEMINI_API_KEY not set. Aborting API call.")
-        return None
+        return None, False
         
-    headers = { "Content-Type": "application/json" }
-    api_url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent?key={GEMINI_API_KEY}"
+    global _gemini_gzip_enabled
+    # 请求体只序列化 (和压缩) 一次，重试时直接复用；压缩级别 1 的 CPU 开销可忽略
+    request_body = _json_dumps(_build_gemini_request_body(prompt_text, response_schema))
+    search_dropped = False # 已改为不联网搜索重试时为 True
+    gzip_body = gzip.compress(request_body, compresslevel=1) if _gemini_gzip_enabled else None
     
     for attempt in range(MAX_RETRIES):
         try:
-            print(f"Starting Gemini API call (Attempt {attempt + 1}/{MAX_RETRIES}) with timeout {REQUEST_TIMEOUT_SECONDS}s...")
-            response = requests.post(
-                api_url, 
-                headers=headers, 
-                # 启用 Google Search Grounding
-                data=json.dumps({"contents": [{"parts": [{"text": prompt_text}]}], "tools": [{"google_search": {}}]}),
-                timeout=REQUEST_TIMEOUT_SECONDS 
-            )
+            print(f"Starting Gemini API call (Attempt {attempt + 1}/{MAX_RETRIES}) with timeout {GEMINI_CONNECT_TIMEOUT:g}s connect / {GEMINI_READ_TIMEOUT:g}s read...")
+            _gemini_limiter.acquire()
+            try:
+                response = None
+                if gzip_body is not None and _gemini_gzip_enabled:
+                    response = _HTTP.post(_GEMINI_GENERATE_URL, headers=_GEMINI_GZIP_HEADERS, data=gzip_body, timeout=GEMINI_TIMEOUT)
+                    if response.status_code in (400, 415):
+                        # 不支持压缩请求体：本次运行的后续调用都改回未压缩，并立即重发当前请求
+                        _gemini_gzip_enabled = False
+                        print(f"Gemini rejected the gzip request body (Status {response.status_code}). Sending uncompressed from now on.")
+                        response = None
+                if response is None:
+                    response = _HTTP.post(
+                        _GEMINI_GENERATE_URL, 
+                        headers=_GEMINI_GENERATE_HEADERS, 
+                        data=request_body,
+                        timeout=GEMINI_TIMEOUT
+                    )
+            finally:
+                _gemini_limiter.release()
             
-            # 检查是否有 5xx 或 429 (Too Many Requests) 错误
-            if response.status_code >= 500 or response.status_code == 429:
-                raise requests.exceptions.RequestException(f"Transient error: Status {response.status_code}")
-                
-            response.raise_for_status() # 对 4xx 客户端错误抛出异常
-            result_json = response.json()
+            # 检查是否有 5xx、408 或 429 (Too Many Requests) 错误
+            if response.status_code >= 500 or response.status_code in (408, 429):
+                _gemini_limiter.on_overload()
+                retry_after = _parse_retry_after(response) if response.status_code == 429 else None
+                raise _TransientAPIError(f"Transient error: Status {response.status_code}", retry_after=retry_after)
+            
+            # 其他 4xx (请求无效、密钥错误、无权限、模型不存在) 重试也不会成功，直接失败
+            if response.status_code >= 400:
+                print(f"Gemini API Call Failed (Permanent Error: Status {response.status_code}). Not retrying.")
+                error_message = f"AI Analysis Failed (HTTP {response.status_code}, not retried): {response.text[:2000]}"
+                _notify_failure("SRE/AI 报告生成失败 (API 请求被拒绝)", error_message)
+                return None, False
+            _gemini_limiter.on_success()
+            # 直接从原始字节解码 (orjson 可用时)，跳过 response.json() 的 bytes→str 解码和编码探测
+            result_json = _json_loads(response.content)
 
             # 增强的鲁棒性检查和内容提取
-            candidate = result_json.get('candidates', [None])[0]
+            candidate = (result_json.get('candidates') or [None])[0]
             if not candidate:
                 raise ValueError("Gemini response is missing 'candidates' array or it is empty.")
             
-            raw_text = candidate.get('content', {}).get('parts', [{}])[0].get('text')
+            # 空的 parts 列表 (如因安全过滤截断) 与缺少文本同样走内容重试，而不是在索引时抛出 IndexError
+            parts = (candidate.get('content') or {}).get('parts') or []
+            if not parts:
+                raise ValueError("Gemini response content has no 'parts'.")
+            raw_text = parts[0].get('text')
             
             if not raw_text:
                 raise ValueError("Gemini response content is missing the 'text' part.")
 
-            # 调试输出
-            print(f"Successfully retrieved Gemini response. Raw text length: {len(raw_text)}")
-            return raw_text
+            # 调试输出 (仅 SRE_AI_DEBUG=1)：正常运行不在成功路径上截取和刷新大段文本
+            if SRE_AI_DEBUG:
+                print(f"Successfully retrieved Gemini response. Raw text length: {len(raw_text)}")
+                print(raw_text[:1000])
+            return raw_text, search_dropped
         
         except requests.exceptions.RequestException as e:
             if attempt < MAX_RETRIES - 1:
-                wait_time = INITIAL_RETRY_SLEEP * (2 ** attempt)
-                print(f"Gemini API Call Failed (Transient Error: {e}). Retrying in {wait_time} seconds...")
+                retry_after = getattr(e, 'retry_after', None)
+                if retry_after is not None:
+                    # 429: 按服务端提示的时间等待，而不是盲目指数退避
+                    wait_time = retry_after
+                else:
+                    # 全抖动指数退避: 在 [下限, 指数上限] 内均匀取值，使并发步骤和其他运行的重试时间彼此错开
+                    wait_time = random.uniform(MIN_RETRY_SLEEP, min(MAX_RETRY_SLEEP, INITIAL_RETRY_SLEEP * (2 ** attempt)))
+                print(f"Gemini API Call Failed (Transient Error: {e}). Retrying in {wait_time:.1f} seconds...")
                 time.sleep(wait_time)
             else:
                 print(f"Gemini API Call Failed after {MAX_RETRIES} attempts: {e}")
                 error_message = f"AI Analysis Failed (Final attempt timeout/error): {e}"
-                send_email_notification(GMAIL_RECIPIENT_EMAILS, "SRE/AI 报告生成失败 (API 错误)", error_message)
-                return None
+                _notify_failure("SRE/AI 报告生成失败 (API 错误)", error_message)
+                return None, False
         
         except ValueError as e:
-            print(f"Gemini API Content Check Failed: {e}")
-            error_message = f"AI Analysis Failed (Missing content): {e}"
-            send_email_notification(GMAIL_RECIPIENT_EMAILS, "SRE/AI 报告生成失败 (AI内容错误)", error_message)
-            return None
+            if attempt < MAX_RETRIES - 1:
+                # 空候选/缺少文本通常是一次性的生成问题，短暂等待后立即重试，不走指数退避
+                print(f"Gemini API Content Check Failed: {e} Retrying in {CONTENT_RETRY_SLEEP} seconds...")
+                if GEMINI_RETRY_WITHOUT_SEARCH and GEMINI_TOOLS:
+                    # 内容问题与资讯新鲜度无关：后续重试跳过联网搜索 (可用结构化输出)，缩短生成时间
+                    print("Retrying without Google Search grounding.")
+                    request_body = _json_dumps(_build_gemini_request_body(prompt_text, response_schema, enable_search=False))
+                    search_dropped = True
+                    gzip_body = gzip.compress(request_body, compresslevel=1) if _gemini_gzip_enabled else None
+                time.sleep(CONTENT_RETRY_SLEEP)
+            else:
+                print(f"Gemini API Content Check Failed after {MAX_RETRIES} attempts: {e}")
+                error_message = f"AI Analysis Failed (Missing content): {e}"
+                _notify_failure("SRE/AI 报告生成失败 (AI内容错误)", error_message)
+                return None, False
             
         except Exception as e:
             print(f"Gemini API Call Failed unexpectedly: {e}")
-            return None
+            return None, False
     
-    return None
+    return None, False
+
+def _response_cache_key(task_name, prompt_text):
+    """Cache key = sha256(model + task_name + run date + prompt hash)."""
+    prompt_hash = hashlib.sha256(prompt_text.encode('utf-8')).hexdigest()
+    return hashlib.sha256(f"{GEMINI_MODEL}|{task_name}|{RUN_DATE_STR}|{prompt_hash}".encode('utf-8')).hexdigest()
+
+def _open_cache_db():
+    """Opens (and creates if needed) the local SQLite cache for responses and page IDs, or returns None."""
+    global _cache_db_ready
+    if not GEMINI_CACHE_DB:
+        return None
+    conn = None
+    try:
+        if not _cache_db_ready:
+            cache_dir = os.path.dirname(GEMINI_CACHE_DB)
+            if cache_dir:
+                os.makedirs(cache_dir, exist_ok=True)
+        conn = sqlite3.connect(GEMINI_CACHE_DB, timeout=10)
+        if not _cache_db_ready:
+            # 建表和 WAL 设置持久保存在文件中，每个进程只需执行一次；WAL 允许写入的同时并发读取
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, raw_text TEXT, ts INTEGER)")
+            conn.execute("CREATE TABLE IF NOT EXISTS pages (db_id TEXT, key TEXT, page_id TEXT, ts INTEGER, PRIMARY KEY (db_id, key))")
+            with conn:
+                expired = int(time.time()) - CACHE_RETENTION_SECONDS
+                conn.execute("DELETE FROM responses WHERE ts < ?", (expired,))
+                conn.execute("DELETE FROM pages WHERE ts < ?", (expired,))
+            _cache_db_ready = True
+        return conn
+    except (sqlite3.Error, OSError) as e:
+        # 缓存目录不可写或不存在时只是不使用缓存，不能让整个运行失败
+        print(f"Local cache unavailable ({GEMINI_CACHE_DB}): {e}")
+        if conn is not None:
+            conn.close()
+        return None
+
+def _open_response_cache():
+    """Opens the cache DB for Gemini responses, unless disabled via SRE_AI_CACHE=0."""
+    if not SRE_AI_CACHE:
+        return None
+    return _open_cache_db()
+
+def _get_cached_response(key):
+    """Returns the cached raw Gemini text for this key, or None on miss or with FORCE_REFRESH."""
+    if FORCE_REFRESH:
+        return None
+    conn = _open_response_cache()
+    if not conn:
+        return None
+    try:
+        row = conn.execute("SELECT raw_text FROM responses WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+    except sqlite3.Error as e:
+        print(f"Gemini response cache lookup failed: {e}")
+        return None
+    finally:
+        conn.close()
+
+def _store_cached_response(key, raw_text):
+    """Stores a successfully parsed raw Gemini text under this key."""
+    conn = _open_response_cache()
+    if not conn:
+        return
+    try:
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO responses (key, raw_text, ts) VALUES (?, ?, ?)", (key, raw_text, int(time.time())))
+    except sqlite3.Error as e:
+        print(f"Gemini response cache write failed: {e}")
+    finally:
+        conn.close()
+
+def _fetch_gemini_json(prompt_text, task_name, response_schema=None, validate=None):
+    """Returns the validated JSON for a task, from the local response cache or a fresh Gemini call."""
+    # validate(data) 返回可用结果或 None；只有通过校验的响应才会被缓存或从缓存中使用
+    if validate is None:
+        validate = lambda data: data
+    cache_key = _response_cache_key(task_name, prompt_text)
+    cached_text = _get_cached_response(cache_key)
+    if cached_text:
+        data = validate(_parse_gemini_response(cached_text, task_name))
+        if data:
+            print(f"Using cached Gemini response for {task_name}.")
+            return data
+        print(f"Cached Gemini response for {task_name} is unusable. Fetching a fresh one.")
+
+    raw_text, search_dropped = _gemini_api_call(prompt_text, response_schema)
+    data = validate(_parse_gemini_response(raw_text, task_name))
+    if data and search_dropped:
+        # 未联网搜索的回复只用于本次运行，不能以联网提示词的键缓存，否则整个报告周期都会复用它
+        print(f"Gemini response for {task_name} was generated without search grounding. Not caching it.")
+    elif data:
+        # 只缓存通过校验的响应，避免缺字段或错误内容在重跑时被反复复用
+        _store_cached_response(cache_key, raw_text)
+    elif raw_text:
+        print(f"Gemini response for {task_name} is missing required data. Not caching it.")
+    return data
+
+_JSON_DECODER = json.JSONDecoder() # 慢速路径用 raw_decode 从文本中间解析出第一个完整对象
+
+def _json_loads(text):
+    """Decodes JSON with orjson when available, otherwise with the stdlib parser."""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+def _json_dumps(obj, sort_keys=False):
+    """Encodes a payload to compact UTF-8 JSON bytes (orjson when available, same bytes either way)."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS if sort_keys else 0)
+    return json.dumps(obj, ensure_ascii=False, sort_keys=sort_keys, separators=(',', ':')).encode('utf-8')
+
+def _extract_json_object(raw_text):
+    """Returns the JSON object starting at the first '{' in raw_text (trailing text ignored), or None."""
+    # 第一个 '{' 之前的代码块标记 (```json) 自然被跳过；对象之后的 ``` (如来源列表) 不影响解析。
+    # 只解析从第一个 '{' 开始的对象：截断的回复解析失败并上报，而不是退而返回内层的某个条目
+    start = raw_text.find('{')
+    if start == -1:
+        return None
+    try:
+        obj, _ = _JSON_DECODER.raw_decode(raw_text, start)
+    except json.JSONDecodeError:
+        return None
+    return obj if isinstance(obj, dict) else None
 
 def _parse_gemini_response(raw_text, task_name):
     """Parses the raw text response into a dictionary."""
     if not raw_text:
         return None
     try:
-        # 尝试查找完整的 JSON 对象 (处理AI可能添加的前导/尾随文本)
-        json_start_index = raw_text.find('{')
-        json_end_index = raw_text.rfind('}')
-        if json_start_index == -1 or json_end_index == -1:
-            raise ValueError("Could not find complete JSON structure.")
-            
-        json_text = raw_text[json_start_index : json_end_index + 1]
-        analysis_data = json.loads(json_text)
+        analysis_data = None
+        # 结构化输出 (responseMimeType=application/json) 时整个文本就是 JSON 对象，直接解析，不查找也不截取
+        if raw_text.startswith('{'):
+            try:
+                analysis_data = _json_loads(raw_text)
+            except ValueError:
+                analysis_data = None
+        if not isinstance(analysis_data, dict):
+            # 带 ```json 围栏或前导/尾随文本时，从第一个 '{' 起单遍解析出完整对象，无需 rfind 和截取副本
+            analysis_data = _extract_json_object(raw_text)
+            if analysis_data is None:
+                raise ValueError("Could not find complete JSON structure.")
         print(f"Successfully parsed JSON data for {task_name}.")
         return analysis_data
     except (json.JSONDecodeError, ValueError) as e:
@@ -164,460 +634,652 @@ def _parse_gemini_response(raw_text, task_name):
         print(raw_text) 
         print("---------------------------------------")
         error_message = f"AI 返回的 JSON 格式错误 ({task_name}): {e}\n\n请检查 AI 响应的原始文本:\n{raw_text[:2000]}"
-        send_email_notification(GMAIL_RECIPIENT_EMAILS, f"SRE/AI 报告生成失败 (JSON解析错误) - {task_name}", error_message)
+        _notify_failure(f"SRE/AI 报告生成失败 (JSON解析错误) - {task_name}", error_message)
         return None
 
 # --- Notion Saving Helpers ---
 
-def _create_notion_page(db_id, properties):
-    """Helper function to create a page in a specific Notion database."""
-    if not notion:
-        print("Notion client not initialized. Skipping save.")
-        return
+def _notion_writable(db_id):
+    """True when pages can be written to db_id (Notion token and DB ID configured)."""
+    if not NOTION_TOKEN:
+        print("Notion token not configured. Skipping save.")
+        return False
     if not db_id:
-        print(f"Notion DB ID is missing. Skipping page creation.")
-        return
+        print("Notion DB ID is missing. Skipping page creation.")
+        return False
+    return True
+
+def _create_notion_page(db_id, properties):
+    """Creates a page in a Notion database over the REST API; returns the page ID or None."""
+    if not _notion_writable(db_id):
+        return None
     try:
         # 尝试创建页面
-        response = notion.pages.create(
-            parent={"database_id": db_id},
-            properties=properties
-        )
-        print(f"Successfully created Notion page (ID: {response['id']}) in DB {db_id}.")
+        payload = _json_dumps({"parent": {"database_id": db_id}, "properties": properties})
+        for attempt in range(1, NOTION_MAX_ATTEMPTS + 1):
+            response = _HTTP.post(NOTION_API_URL, headers=_NOTION_HEADERS, data=payload, timeout=NOTION_TIMEOUT)
+            if response.status_code != 429 or attempt == NOTION_MAX_ATTEMPTS:
+                break
+            # 被限流：按服务端提示等待后重新排队领取令牌，不丢弃该页面
+            retry_after = _parse_retry_after(response)
+            wait_time = NOTION_RATE_LIMIT_SLEEP if retry_after is None else retry_after
+            print(f"Notion rate limited (429) in DB {db_id}. Retrying in {wait_time:.1f}s (attempt {attempt}/{NOTION_MAX_ATTEMPTS}).")
+            time.sleep(wait_time)
+            _notion_throttle()
+        if response.status_code >= 400:
+            # Notion 的错误详情在响应体的 message 字段中
+            raise requests.exceptions.HTTPError(f"Status {response.status_code}: {response.text}")
+        page_id = _json_loads(response.content)['id']
+        print(f"Successfully created Notion page (ID: {page_id}) in DB {db_id}.")
+        return page_id
     except Exception as e:
         # 打印详细错误信息
         print(f"Failed to create Notion page in DB {db_id}: {e}")
         print(f"Failed properties were: {properties}")
         print("Hint: This is usually due to property key names not matching your Notion database column headers (English Field Name) exactly or a fundamental type mismatch.")
+        return None
+
+def _notion_page_key(properties):
+    """Content hash of a page's properties, used to recognize pages created by an earlier run."""
+    return hashlib.sha1(_json_dumps(properties, sort_keys=True)).hexdigest()
+
+def _get_created_page_id(db_id, page_key):
+    """Returns the Notion page ID recorded for this content in db_id, or None (always None with --force)."""
+    if _force_notion_writes:
+        return None
+    conn = _open_cache_db()
+    if not conn:
+        return None
+    try:
+        row = conn.execute("SELECT page_id FROM pages WHERE db_id = ? AND key = ?", (db_id, page_key)).fetchone()
+        return row[0] if row else None
+    except sqlite3.Error as e:
+        print(f"Notion page cache lookup failed: {e}")
+        return None
+    finally:
+        conn.close()
+
+def _store_created_page_id(db_id, page_key, page_id):
+    """Records a created Notion page so a re-run with the same content does not duplicate it."""
+    conn = _open_cache_db()
+    if not conn:
+        return
+    try:
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO pages (db_id, key, page_id, ts) VALUES (?, ?, ?, ?)", (db_id, page_key, page_id, int(time.time())))
+    except sqlite3.Error as e:
+        print(f"Notion page cache write failed: {e}")
+    finally:
+        conn.close()
+
+def _notion_throttle():
+    """Token bucket for Notion requests: NOTION_BURST_SIZE at once, then NOTION_REQUESTS_PER_SECOND."""
+    global _notion_tokens, _notion_last_refill
+    with _notion_rate_lock:
+        now = time.monotonic()
+        _notion_tokens = min(NOTION_BURST_SIZE, _notion_tokens + (now - _notion_last_refill) * NOTION_REQUESTS_PER_SECOND)
+        _notion_last_refill = now
+        _notion_tokens -= 1
+        wait_time = -_notion_tokens / NOTION_REQUESTS_PER_SECOND if _notion_tokens < 0 else 0
+    if wait_time > 0:
+        time.sleep(wait_time)
+
+def _create_notion_page_throttled(db_id, properties):
+    """Rate-limited wrapper around _create_notion_page that skips pages already written."""
+    page_key = _notion_page_key(properties)
+    claim = (db_id, page_key)
+    # 本进程内的相同页面即使未启用页面缓存也只写一次；之前运行已创建的页面由缓存文件识别
+    with _pending_writes_lock:
+        if claim in _claimed_pages:
+            print(f"Identical Notion page already written in this run for DB {db_id}. Skipping duplicate.")
+            return None
+        _claimed_pages.add(claim)
+    page_id = _get_created_page_id(db_id, page_key)
+    if page_id:
+        print(f"Notion page already exists (ID: {page_id}) in DB {db_id}. Skipping duplicate.")
+        return page_id
+    _notion_throttle()
+    page_id = _create_notion_page(db_id, properties)
+    if page_id:
+        _store_created_page_id(db_id, page_key, page_id)
+    else:
+        # 写入失败时释放占位，允许同一内容稍后重试
+        with _pending_writes_lock:
+            _claimed_pages.discard(claim)
+    return page_id
+
+def _create_notion_pages(db_id, properties_list):
+    """Submits all pages for one database to the Notion write pool without waiting."""
+    futures = [_NOTION_POOL.submit(_create_notion_page_throttled, db_id, properties) for properties in properties_list]
+    with _pending_writes_lock:
+        _pending_notion_writes.extend(futures)
+
+def _wait_for_notion_writes():
+    """Blocks until every submitted Notion page write has finished and reports the count."""
+    with _pending_writes_lock:
+        futures = list(_pending_notion_writes)
+        _pending_notion_writes.clear()
+    if futures:
+        print(f"Waiting for {len(futures)} pending Notion page writes...")
+        wait(futures)
+        created = sum(1 for future in futures if not future.exception() and future.result())
+        print(f"Notion writes finished: {created} created or already present, {len(futures) - created} failed or skipped.")
+
+
+# --- Notion Property Builders ---
+
+def _title(value, default='N/A'):
+    """Notion title property."""
+    return {"title": [{"text": {"content": value or default}}]}
+
+def _rt(value, default='N/A'):
+    """Notion rich_text property."""
+    return {"rich_text": [{"text": {"content": value or default}}]}
+
+def _url(value):
+    """Notion url property."""
+    # 只有当链接有效时才发送，否则发送 None，Notion 会因为空字符串报错
+    return {"url": value if value and value.strip() else None}
+
+def _date(value):
+    """Notion date property (YYYY-MM-DD or ISO 8601 timestamp)."""
+    return {"date": {"start": value}}
+
+# 可为空的 rich_text 字段 (如 focus_areas、tags) 空值时写入空字符串而不是 'N/A'
+_rt_or_empty = partial(_rt, default='')
+
+def _build_properties(spec, item):
+    """Builds the Notion properties for one validated item from a (name, constructor, field) spec."""
+    return {name: build(item[field]) for name, build, field in spec}
 
 
 # --- Modular Prompts and Schemas (Using English Field Names) ---
 
-def _get_overall_summary():
-    """Step 1: Get Report Metadata and Overall Summary (for Report Master DB)."""
-    task_name = "Report Master"
-    
-    # 获取本周的起始和结束日期
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=6)
-    
-    report_week_start = start_date.strftime("%Y-%m-%d")
-    report_week_end = end_date.strftime("%Y-%m-%d")
-    
-    # 按照 Report 表的字段设计 JSON Schema
-    schema = {
-        "title": f"全球运维与 AI 周报 ({report_week_start} - {report_week_end})",
-        "report_week_start": report_week_start,
-        "report_week_end": report_week_end,
-        "status": "Draft",
-        "overall_summary": "本周全球 SRE 领域主要关注 AIOps 的落地和云成本优化，AI 领域重点是多模态模型的商用进展...",
-    }
+# Report 表的 JSON Schema (周期日期取自本次运行的统一时间戳)
+_REPORT_SCHEMA = {
+    "title": f"全球运维与 AI 周报 ({REPORT_WEEK_START} - {REPORT_WEEK_END})",
+    "report_week_start": REPORT_WEEK_START,
+    "report_week_end": REPORT_WEEK_END,
+    "status": "Draft",
+    "overall_summary": "本周全球 SRE 领域主要关注 AIOps 的落地和云成本优化，AI 领域重点是多模态模型的商用进展...",
+}
+# 提示词中展示的 Report 结构 (摘要处为填写说明)，Step 1 和合并模式共用，导入时序列化一次
+_REPORT_PROMPT_SCHEMA = dict(_REPORT_SCHEMA, overall_summary="此处填写本周运维与AI领域的综合性总结")
+_REPORT_SCHEMA_STR = json.dumps(_REPORT_PROMPT_SCHEMA, indent=4, ensure_ascii=False)
+
+# 列表类步骤的 Schema 是常量，在导入时序列化一次，避免每次调用重复 json.dumps。
+# 示例中的日期只写格式占位符，运行日期放在提示词末尾的短句中：提示词主体逐日不变，前缀可被缓存复用
+_RUN_DATE_NOTE = f"今天是 {RUN_DATE_STR}，日期字段请填写资讯实际发布的日期。"
+
+# SRE_Dynamics 表的 JSON Schema (按 Field Name 设计)
+_SRE_DYNAMICS_SCHEMA = {
+    "sreDynamics": [
+        {
+            "title": "Google 发布下一代 SRE 实践指南", 
+            "summary": "指南强调了 SLI/SLO 的动态调整和混沌工程...", 
+            "source_company": "Google",
+            "release_date": "YYYY-MM-DD",
+            "official_link": "https://example.com/sre-guide",
+            "focus_areas": "AIOps, Chaos Engineering", # 保持为逗号分隔的字符串
+            "analysis_content": "该报告表明 SRE 正在从被动响应转向主动弹性设计..."
+        },
+    ]
+}
+_SRE_DYNAMICS_SCHEMA_STR = json.dumps(_SRE_DYNAMICS_SCHEMA, indent=4, ensure_ascii=False)
+
+# Failure_Incidents 表的 JSON Schema (按 Field Name 设计)
+_FAILURE_INCIDENTS_SCHEMA = {
+    "failureIncidents": [
+        {
+            "incident_title": "数据库连接池饱和导致全球服务中断", 
+            "company": "大型云服务商", 
+            "incident_date": "2025-09-01T10:00:00Z", # 使用 ISO 8601 Timestamp 格式
+            "official_link": "https://example.com/incident-report-001",
+            "overview": "服务中断 30 分钟，影响全球多个区域。",
+            "root_cause": "数据库连接池饱和，未能及时扩容",
+            "timeline": "10:00 - 发现告警；10:15 - 紧急扩容；10:30 - 服务恢复。",
+            "improvement_measures": "实施连接池弹性伸缩机制并限制连接数。",
+            "lessons_learned": "在高并发场景下，连接池的动态管理至关重要。"
+        },
+    ]
+}
+_FAILURE_INCIDENTS_SCHEMA_STR = json.dumps(_FAILURE_INCIDENTS_SCHEMA, indent=4, ensure_ascii=False)
+
+# AI_News 表的 JSON Schema (按 Field Name 设计)
+_AI_NEWS_SCHEMA = {
+    "aiNews": [
+        {
+            "title": "OpenAI 推出 GPT-5，具备原生多模态能力", 
+            "summary": "新模型在长文本理解和图像生成方面取得突破性进展...", 
+            "source": "OpenAI 官网",
+            "publish_date": "YYYY-MM-DD",
+            "news_link": "https://example.com/gpt5",
+            "category": "Model Release (模型发布)", # 保持为字符串
+            "analysis": "GPT-5 的发布加速了多模态在商业应用中的普及。"
+        },
+    ]
+}
+_AI_NEWS_SCHEMA_STR = json.dumps(_AI_NEWS_SCHEMA, indent=4, ensure_ascii=False)
+
+# AI_Learning 表的 JSON Schema (按 Field Name 设计)
+_AI_LEARNING_SCHEMA = {
+    "aiLearning": [
+        {
+            "material_name": "《深度学习系统设计》", 
+            "description": "深入理解大型模型训练与推理的架构。", 
+            "type": "Book (书籍)", # 保持为字符串
+            "difficulty": "Advanced (高级)", # 保持为字符串
+            "link": "https://example.com/deep-learning-book",
+            "tags": "LLM, System Design" # 简化为字符串
+        },
+    ]
+}
+_AI_LEARNING_SCHEMA_STR = json.dumps(_AI_LEARNING_SCHEMA, indent=4, ensure_ascii=False)
+
+# AI_Business_Opportunity 表的 JSON Schema (按 Field Name 设计)
+_AI_BUSINESS_SCHEMA = {
+    "aiBusinessOpportunity": [
+        {
+            "opportunity_title": "基于 RAG 的垂直知识库 SaaS", 
+            "description": "为特定行业（如医疗）提供定制化的 RAG 解决方案，解决企业内部知识检索效率问题。", 
+            "potential_market": "医疗行业, 零售电商",
+            "value_proposition": "提供高准确率和低成本的知识检索服务，显著提高专家工作效率。",
+            "trend_reference": "多模态大模型的推理能力增强",
+            "trend_link": "https://example.com/trend-report-link", # AI 必须返回此字段
+            "estimated_effort": "Medium (中)", 
+        },
+    ]
+}
+_AI_BUSINESS_SCHEMA_STR = json.dumps(_AI_BUSINESS_SCHEMA, indent=4, ensure_ascii=False)
+
+def _to_response_schema(example):
+    """Converts an example JSON structure into a Gemini responseSchema (all leaves are strings)."""
+    if isinstance(example, dict):
+        return {
+            "type": "OBJECT",
+            "properties": {key: _to_response_schema(value) for key, value in example.items()},
+            "required": list(example),
+            "propertyOrdering": list(example),
+        }
+    if isinstance(example, list):
+        return {"type": "ARRAY", "items": _to_response_schema(example[0])}
+    return {"type": "STRING"}
+
+# 结构化输出使用的 responseSchema，在导入时由示例 Schema 转换一次
+_REPORT_RESPONSE_SCHEMA = _to_response_schema(_REPORT_SCHEMA)
+_SRE_DYNAMICS_RESPONSE_SCHEMA = _to_response_schema(_SRE_DYNAMICS_SCHEMA)
+_FAILURE_INCIDENTS_RESPONSE_SCHEMA = _to_response_schema(_FAILURE_INCIDENTS_SCHEMA)
+_AI_NEWS_RESPONSE_SCHEMA = _to_response_schema(_AI_NEWS_SCHEMA)
+_AI_LEARNING_RESPONSE_SCHEMA = _to_response_schema(_AI_LEARNING_SCHEMA)
+_AI_BUSINESS_RESPONSE_SCHEMA = _to_response_schema(_AI_BUSINESS_SCHEMA)
+
+# 各列表部分的字段规格 (字段名 -> 缺失或为空时的默认值)，由上面的 Schema 在导入时生成一次
+_SECTION_FIELD_DEFAULTS = {
+    'sreDynamics': {
+        **dict.fromkeys(_SRE_DYNAMICS_SCHEMA['sreDynamics'][0], 'N/A'),
+        'release_date': RUN_DATE_STR, 'official_link': '', 'focus_areas': '',
+    },
+    'failureIncidents': {
+        **dict.fromkeys(_FAILURE_INCIDENTS_SCHEMA['failureIncidents'][0], 'N/A'),
+        'incident_date': RUN_DATE_STR, 'official_link': '', # 日期默认值按天固定，重跑时页面去重键不变
+    },
+    'aiNews': {
+        **dict.fromkeys(_AI_NEWS_SCHEMA['aiNews'][0], 'N/A'),
+        'publish_date': RUN_DATE_STR, 'news_link': '',
+    },
+    'aiLearning': {
+        **dict.fromkeys(_AI_LEARNING_SCHEMA['aiLearning'][0], 'N/A'),
+        'link': '', 'tags': '',
+    },
+    'aiBusinessOpportunity': {
+        **dict.fromkeys(_AI_BUSINESS_SCHEMA['aiBusinessOpportunity'][0], 'N/A'),
+        'trend_link': '',
+    },
+}
+
+# Report 摘要的字段规格：标题和周期日期缺失时使用预设值
+_SUMMARY_FIELD_DEFAULTS = dict(_REPORT_SCHEMA, overall_summary='N/A')
+
+def _coerce_fields(item, field_defaults):
+    """Returns item with exactly the fields of field_defaults as strings, defaults filling the blanks."""
+    clean_item = {}
+    for field, default in field_defaults.items():
+        value = item.get(field)
+        if isinstance(value, list):
+            value = ", ".join(str(v) for v in value)
+        elif value is not None and not isinstance(value, str):
+            value = str(value)
+        clean_item[field] = value if value and value.strip() else default
+    return clean_item
+
+def _validate_summary(data):
+    """Returns the cleaned Report summary, or None when it is not an object or has no overall_summary."""
+    if not isinstance(data, dict):
+        if data is not None:
+            print(f"Schema check failed: report summary is not an object: {data!r}")
+        return None
+    if not data.get('overall_summary'):
+        print("Schema check failed: report summary has no 'overall_summary'.")
+        return None
+    return _coerce_fields(data, _SUMMARY_FIELD_DEFAULTS)
+
+def _validate_section(data, data_key):
+    """Validates one list section in place against _SECTION_FIELD_DEFAULTS and returns its items."""
+    if not isinstance(data, dict):
+        return []
+    items = data.get(data_key)
+    if not isinstance(items, list):
+        if items is not None:
+            print(f"Schema check failed: '{data_key}' is not a list. Ignoring section.")
+            # 不合法的值不能留在 data 中，否则后续读取该部分时会被当作列表使用
+            data[data_key] = []
+        return []
     
-    prompt = f"""
-请根据可联网搜索到的过去一周（{report_week_start} 至 {report_week_end}）的行业新闻和技术进展，生成周报的**标题**和**本周总体摘要**（overall_summary）。
+    field_defaults = _SECTION_FIELD_DEFAULTS[data_key]
+    validated = []
+    for item in items:
+        if not isinstance(item, dict):
+            print(f"Schema check: dropping non-object entry in '{data_key}': {item!r}")
+            continue
+        validated.append(_coerce_fields(item, field_defaults))
+    data[data_key] = validated
+    return validated
+
+
+# 各步骤的提示词只依赖运行时间戳和 Schema 常量，在导入时构建一次 (与合并模式的 _COMBINED_PROMPT 相同)
+_REPORT_PROMPT = f"""
+请根据可联网搜索到的过去一周（{REPORT_WEEK_START} 至 {REPORT_WEEK_END}）的行业新闻和技术进展，生成周报的**标题**和**本周总体摘要**（overall_summary）。
 周报的主题是全球 SRE 运维和人工智能领域。
-请严格按照以下 JSON 结构返回数据，**不允许添加任何 Markdown 格式或额外文本**。**每一个主题后面附加的网页链接都需要确保是正确和可用的**;
+请按照以下 JSON 结构返回数据。**每一个主题后面附加的网页链接都需要确保是正确和可用的**;
 JSON 结构中的 'title'、'report_week_start' 和 'report_week_end' 请使用我提供的预设值。
-JSON 结构: {{
-    "title": "{schema['title']}",
-    "report_week_start": "{schema['report_week_start']}",
-    "report_week_end": "{schema['report_week_end']}",
-    "status": "Draft",
-    "overall_summary": "此处填写本周运维与AI领域的综合性总结"
-}}
+JSON 结构: {_REPORT_SCHEMA_STR}
 """
-    raw_text = _gemini_api_call(prompt)
-    data = _parse_gemini_response(raw_text, task_name)
-    
-    if data:
-        # 整合数据以供 Notion 写入
-        report_properties = {
-            "title": { "title": [{"text": {"content": data.get('title', 'N/A')}}] },
-            "report_week_start": { "date": {"start": data.get('report_week_start', report_week_start)} },
-            "report_week_end": { "date": {"start": data.get('report_week_end', report_week_end)} },
-            # FIX: 强制将 status 字段转换为 Rich Text (兼容旧的 Notion 配置)
-            "status": { "rich_text": [{"text": {"content": data.get('status', 'Draft')}}] },
-        }
-        _create_notion_page(NOTION_DB_REPORT, report_properties)
-        data['report_week_start'] = report_week_start # 确保日期在返回结果中
-        data['report_week_end'] = report_week_end
-    
+
+def _get_overall_summary():
+    """Step 1: Get Report Metadata and Overall Summary (for Report Master DB)."""
+    task_name = "Report Master"
+    data = _fetch_gemini_json(_REPORT_PROMPT, task_name, _REPORT_RESPONSE_SCHEMA, _validate_summary)
+    _save_overall_summary(data)
     return data
 
 
-def _get_sre_dynamics():
-    """Step 2: Get SRE Dynamics data (for SRE_Dynamics DB)."""
-    task_name = "SRE Dynamics"
-    # 严格按照 SRE_Dynamics 表的 Field Name 设计 JSON Schema
-    schema = {
-        "sreDynamics": [
-            {
-                "title": "Google 发布下一代 SRE 实践指南", 
-                "summary": "指南强调了 SLI/SLO 的动态调整和混沌工程...", 
-                "source_company": "Google",
-                "release_date": datetime.now().strftime("%Y-%m-%d"),
-                "official_link": "https://example.com/sre-guide",
-                "focus_areas": "AIOps, Chaos Engineering", # 保持为逗号分隔的字符串
-                "analysis_content": "该报告表明 SRE 正在从被动响应转向主动弹性设计..."
-            },
-        ]
-    }
-    prompt = f"""
+def _save_overall_summary(data):
+    """Writes the Report Master page and pins the report dates on the summary data."""
+    if data:
+        if _notion_writable(NOTION_DB_REPORT):
+            # 整合数据以供 Notion 写入
+            report_properties = {
+                "title": _title(data['title']),
+                "report_week_start": _date(data['report_week_start']),
+                "report_week_end": _date(data['report_week_end']),
+                # FIX: 强制将 status 字段转换为 Rich Text (兼容旧的 Notion 配置)
+                "status": _rt(data['status'], 'Draft'),
+            }
+            _create_notion_pages(NOTION_DB_REPORT, [report_properties])
+        data['report_week_start'] = REPORT_WEEK_START # 确保日期在返回结果中
+        data['report_week_end'] = REPORT_WEEK_END
+
+
+_SRE_DYNAMICS_PROMPT = f"""
 请根据可联网搜索到的信息，提供 **至少 3 条，最好 5 条** 全球 SRE 和云原生领域的关键技术进展或最佳实践。
-请严格按照以下 JSON 结构返回数据，**不允许添加任何 Markdown 格式或额外文本**。
+请按照以下 JSON 结构返回数据。
 
 **【强制约束】**
 1. **内容数量**: 必须提供至少 3 条记录，理想是 5 条。
 2. **链接**: 字段 `official_link` 必须包含一个有效的 URL 链接，**不允许为空**。如果找不到链接，请不要返回该条记录。
 
 注意：'release_date' 必须是 YYYY-MM-DD 格式，'focus_areas' 必须是逗号分隔的字符串。
-JSON 结构: {json.dumps(schema, indent=4, ensure_ascii=False)}
+JSON 结构: {_SRE_DYNAMICS_SCHEMA_STR}
+{_RUN_DATE_NOTE}
 """
-    raw_text = _gemini_api_call(prompt)
-    data = _parse_gemini_response(raw_text, task_name)
-    
-    if data and data.get('sreDynamics'):
-        for item in data['sreDynamics']:
-            official_link = item.get('official_link')
-            # 只有当链接有效时才发送 None，否则 Notion 会因为空字符串报错
-            official_link_value = official_link if official_link and official_link.strip() else None 
-
-            focus_areas_str = item.get('focus_areas', '')
-
-            dynamic_properties = {
-                "title": { "title": [{"text": {"content": item.get('title', 'N/A')}}] },
-                "summary": { "rich_text": [{"text": {"content": item.get('summary', 'N/A')}}] },
-                "source_company": { "rich_text": [{"text": {"content": item.get('source_company', 'N/A')}}] },
-                "release_date": { "date": {"start": item.get('release_date', datetime.now().strftime("%Y-%m-%d"))} },
-                "official_link": { "url": official_link_value },
-                # 修复: 确认 focus_areas 字段类型为 Rich Text
-                "focus_areas": { "rich_text": [{"text": {"content": focus_areas_str}}] }, 
-                "analysis_content": { "rich_text": [{"text": {"content": item.get('analysis_content', 'N/A')}}] },
-            }
-            _create_notion_page(NOTION_DB_SRE_DYNAMICS, dynamic_properties)
-    return data
 
+# SRE Dynamics 的 Notion 属性规格: (Notion 属性名, 属性构造函数, 英文 Field Name)
+_SRE_DYNAMICS_PROPERTIES = (
+    ("title", _title, "title"),
+    ("summary", _rt, "summary"),
+    ("source_company", _rt, "source_company"),
+    ("release_date", _date, "release_date"),
+    ("official_link", _url, "official_link"),
+    # 修复: 确认 focus_areas 字段类型为 Rich Text
+    ("focus_areas", _rt_or_empty, "focus_areas"),
+    ("analysis_content", _rt, "analysis_content"),
+)
 
-def _get_failure_incidents():
-    """Step 3: Get Global Failure Incidents data (for Failure_Incidents DB)."""
-    task_name = "Failure Incidents"
-    # 严格按照 Failure_Incidents 表的 Field Name 设计 JSON Schema
-    schema = {
-        "failureIncidents": [
-            {
-                "incident_title": "数据库连接池饱和导致全球服务中断", 
-                "company": "大型云服务商", 
-                "incident_date": "2025-09-01T10:00:00Z", # 使用 ISO 8601 Timestamp 格式
-                "official_link": "https://example.com/incident-report-001",
-                "overview": "服务中断 30 分钟，影响全球多个区域。",
-                "root_cause": "数据库连接池饱和，未能及时扩容",
-                "timeline": "10:00 - 发现告警；10:15 - 紧急扩容；10:30 - 服务恢复。",
-                "improvement_measures": "实施连接池弹性伸缩机制并限制连接数。",
-                "lessons_learned": "在高并发场景下，连接池的动态管理至关重要。"
-            },
-        ]
-    }
-    prompt = f"""
+
+_FAILURE_INCIDENTS_PROMPT = f"""
 请根据可联网搜索到的信息，提供 **至少 3 条，最好 5 条** 过去一周发生的具有影响力的、公开披露的全球性服务故障。
 必须包含所有字段：incident_title, company, official_link (链接), overview, root_cause, improvement_measures, incident_date (务必使用 ISO 8601 Timestamp 格式，如 YYYY-MM-DDTHH:MM:SSZ)。
-请严格按照以下 JSON 结构返回数据，**不允许添加任何 Markdown 格式或额外文本**。
+请按照以下 JSON 结构返回数据。
 
 **【强制约束】**
 1. **内容数量**: 必须提供至少 3 条记录，理想是 5 条。
 2. **链接**: 字段 `official_link` 必须包含一个有效的 URL 链接，**不允许为空**。如果找不到链接，请不要返回该条记录。
 
-JSON 结构: {json.dumps(schema, indent=4, ensure_ascii=False)}
+JSON 结构: {_FAILURE_INCIDENTS_SCHEMA_STR}
 """
-    raw_text = _gemini_api_call(prompt)
-    data = _parse_gemini_response(raw_text, task_name)
-    
-    if data and data.get('failureIncidents'):
-        for item in data['failureIncidents']:
-            official_link = item.get('official_link')
-            # 只有当链接有效时才发送 None，否则 Notion 会因为空字符串报错
-            official_link_value = official_link if official_link and official_link.strip() else None 
-            
-            # 使用英文 Field Name
-            incident_properties = {
-                "incident_title": { "title": [{"text": {"content": item.get('incident_title', 'N/A')}}] },
-                "company": { "rich_text": [{"text": {"content": item.get('company', 'N/A')}}] },
-                "incident_date": { "date": {"start": item.get('incident_date', datetime.now().isoformat() + 'Z')} }, # Notion Date Type with time
-                "official_link": { "url": official_link_value },
-                "overview": { "rich_text": [{"text": {"content": item.get('overview', 'N/A')}}] },
-                "root_cause": { "rich_text": [{"text": {"content": item.get('root_cause', 'N/A')}}] },
-                "timeline": { "rich_text": [{"text": {"content": item.get('timeline', 'N/A')}}] },
-                "improvement_measures": { "rich_text": [{"text": {"content": item.get('improvement_measures', 'N/A')}}] },
-                "lessons_learned": { "rich_text": [{"text": {"content": item.get('lessons_learned', 'N/A')}}] },
-            }
-            _create_notion_page(NOTION_DB_FAILURE_INCIDENTS, incident_properties)
-    return data
-
 
-def _get_ai_news():
-    """Step 4: Get AI News data (for AI_News DB)."""
-    task_name = "AI News"
-    # 严格按照 AI_News 表的 Field Name 设计 JSON Schema
-    schema = {
-        "aiNews": [
-            {
-                "title": "OpenAI 推出 GPT-5，具备原生多模态能力", 
-                "summary": "新模型在长文本理解和图像生成方面取得突破性进展...", 
-                "source": "OpenAI 官网",
-                "publish_date": datetime.now().strftime("%Y-%m-%d"),
-                "news_link": "https://example.com/gpt5",
-                "category": "Model Release (模型发布)", # 保持为字符串
-                "analysis": "GPT-5 的发布加速了多模态在商业应用中的普及。"
-            },
-        ]
-    }
-    prompt = f"""
+# Failure Incident 的 Notion 属性规格
+_FAILURE_INCIDENT_PROPERTIES = (
+    ("incident_title", _title, "incident_title"),
+    ("company", _rt, "company"),
+    ("incident_date", _date, "incident_date"), # Notion Date Type with time
+    ("official_link", _url, "official_link"),
+    ("overview", _rt, "overview"),
+    ("root_cause", _rt, "root_cause"),
+    ("timeline", _rt, "timeline"),
+    ("improvement_measures", _rt, "improvement_measures"),
+    ("lessons_learned", _rt, "lessons_learned"),
+)
+
+
+_AI_NEWS_PROMPT = f"""
 请根据可联网搜索到的信息，提供 **至少 3 条，最好 5 条** 关于模型、算法、监管或硬件的重大 AI 前沿资讯。
-请严格按照以下 JSON 结构返回数据，**不允许添加任何 Markdown 格式或额外文本**。
+请按照以下 JSON 结构返回数据。
 
 **【强制约束】**
 1. **内容数量**: 必须提供至少 3 条记录，理想是 5 条。
 2. **链接**: 字段 `news_link` 必须包含一个有效的 URL 链接，**不允许为空**。如果找不到链接，请不要返回该条记录。
 
 注意：'publish_date' 必须是 YYYY-MM-DD 格式。
-JSON 结构: {json.dumps(schema, indent=4, ensure_ascii=False)}
+JSON 结构: {_AI_NEWS_SCHEMA_STR}
+{_RUN_DATE_NOTE}
 """
-    raw_text = _gemini_api_call(prompt)
-    data = _parse_gemini_response(raw_text, task_name)
-    
-    if data and data.get('aiNews'):
-        for item in data['aiNews']:
-            news_link = item.get('news_link')
-            # 只有当链接有效时才发送 None，否则 Notion 会因为空字符串报错
-            news_link_value = news_link if news_link and news_link.strip() else None 
-
-            # 使用英文 Field Name
-            news_properties = {
-                "title": { "title": [{"text": {"content": item.get('title', 'N/A')}}] },
-                "summary": { "rich_text": [{"text": {"content": item.get('summary', 'N/A')}}] },
-                "source": { "rich_text": [{"text": {"content": item.get('source', 'N/A')}}] },
-                "publish_date": { "date": {"start": item.get('publish_date', datetime.now().strftime("%Y-%m-%d"))} },
-                "news_link": { "url": news_link_value },
-                # FIX: 强制将 category 字段转换为 Rich Text (兼容旧的 Notion 配置)
-                "category": { "rich_text": [{"text": {"content": item.get('category', 'N/A')}}] },
-                "analysis": { "rich_text": [{"text": {"content": item.get('analysis', 'N/A')}}] },
-            }
-            _create_notion_page(NOTION_DB_AI_NEWS, news_properties)
-    return data
 
+# AI News 的 Notion 属性规格
+_AI_NEWS_PROPERTIES = (
+    ("title", _title, "title"),
+    ("summary", _rt, "summary"),
+    ("source", _rt, "source"),
+    ("publish_date", _date, "publish_date"),
+    ("news_link", _url, "news_link"),
+    # FIX: 强制将 category 字段转换为 Rich Text (兼容旧的 Notion 配置)
+    ("category", _rt, "category"),
+    ("analysis", _rt, "analysis"),
+)
 
-def _get_ai_learning():
-    """Step 5: Get AI Learning data (for AI_Learning DB)."""
-    task_name = "AI Learning"
-    # 严格按照 AI_Learning 表的 Field Name 设计 JSON Schema
-    schema = {
-        "aiLearning": [
-            {
-                "material_name": "《深度学习系统设计》", 
-                "description": "深入理解大型模型训练与推理的架构。", 
-                "type": "Book (书籍)", # 保持为字符串
-                "difficulty": "Advanced (高级)", # 保持为字符串
-                "link": "https://example.com/deep-learning-book",
-                "tags": "LLM, System Design" # 简化为字符串
-            },
-        ]
-    }
-    prompt = f"""
+
+_AI_LEARNING_PROMPT = f"""
 请根据可联网搜索到的信息，提供 **至少 3 个，最好 5 个** 值得推荐的最新的前沿学习资源。资源主题应围绕 SRE、AIOps 或前沿 AI 技术，不限于网页、书本、视频。
 
-请严格按照以下 JSON 结构返回数据，**不允许添加任何 Markdown 格式或额外文本**。
+请按照以下 JSON 结构返回数据。
 
 **【强制约束】**
 1. **内容数量**: 必须提供至少 3 条记录，理想是 5 条。
 2. **链接**: 字段 `link` 必须包含一个有效的 URL 链接，**不允许为空**。如果找不到链接，请不要返回该条记录。
 
 注意：'tags' 必须是逗号分隔的字符串。
-JSON 结构: {json.dumps(schema, indent=4, ensure_ascii=False)}
+JSON 结构: {_AI_LEARNING_SCHEMA_STR}
 """
-    raw_text = _gemini_api_call(prompt)
-    data = _parse_gemini_response(raw_text, task_name)
-    
-    if data and data.get('aiLearning'):
-        for item in data['aiLearning']:
-            link = item.get('link')
-            # 只有当链接有效时才发送 None，否则 Notion 会因为空字符串报错
-            link_value = link if link and link.strip() else None 
-            
-            # 使用英文 Field Name
-            learning_properties = {
-                "material_name": { "title": [{"text": {"content": item.get('material_name', 'N/A')}}] },
-                "description": { "rich_text": [{"text": {"content": item.get('description', 'N/A')}}] },
-                # FIX: 强制将 type, difficulty, tags 字段转换为 Rich Text (兼容旧的 Notion 配置)
-                "type": { "rich_text": [{"text": {"content": item.get('type', 'N/A')}}] },
-                "difficulty": { "rich_text": [{"text": {"content": item.get('difficulty', 'N/A')}}] },
-                "link": { "url": link_value },
-                "tags": { "rich_text": [{"text": {"content": item.get('tags', '')}}] },
-            }
-            _create_notion_page(NOTION_DB_AI_LEARNING, learning_properties)
-    return data
 
+# AI Learning 的 Notion 属性规格
+_AI_LEARNING_PROPERTIES = (
+    ("material_name", _title, "material_name"),
+    ("description", _rt, "description"),
+    # FIX: 强制将 type, difficulty, tags 字段转换为 Rich Text (兼容旧的 Notion 配置)
+    ("type", _rt, "type"),
+    ("difficulty", _rt, "difficulty"),
+    ("link", _url, "link"),
+    ("tags", _rt_or_empty, "tags"),
+)
 
-def _get_ai_business():
-    """Step 6: Get AI Business Opportunity data (for AI_Business_Opportunity DB)."""
-    task_name = "AI Business Opportunity"
-    # 严格按照 AI_Business_Opportunity 表的 Field Name 设计 JSON Schema
-    schema = {
-        "aiBusinessOpportunity": [
-            {
-                "opportunity_title": "基于 RAG 的垂直知识库 SaaS", 
-                "description": "为特定行业（如医疗）提供定制化的 RAG 解决方案，解决企业内部知识检索效率问题。", 
-                "potential_market": "医疗行业, 零售电商",
-                "value_proposition": "提供高准确率和低成本的知识检索服务，显著提高专家工作效率。",
-                "trend_reference": "多模态大模型的推理能力增强",
-                "trend_link": "https://example.com/trend-report-link", # AI 必须返回此字段
-                "estimated_effort": "Medium (中)", 
-            },
-        ]
-    }
-    prompt = f"""
+
+_AI_BUSINESS_PROMPT = f"""
 请根据可联网搜索到的信息，提供 **至少 3 个，最好 5 个** 基于当前 AI 技术的潜在商业化方向。
 必须包含商机标题、详细描述、潜在市场、价值主张、支撑趋势、预估投入（如：Low (低), Medium (中), High (高)）以及**支撑该趋势的报告链接**。
-请严格按照以下 JSON 结构返回数据，**不允许添加任何 Markdown 格式或额外文本**。
+请按照以下 JSON 结构返回数据。
 
 **【强制约束】**
 1. **内容数量**: 必须提供至少 3 条记录，理想是 5 条。
 2. **链接**: 字段 `trend_link` 必须包含一个有效的 URL 链接，**不允许为空**。如果找不到链接，请不要返回该条记录。
 
-JSON 结构: {json.dumps(schema, indent=4, ensure_ascii=False)}
+JSON 结构: {_AI_BUSINESS_SCHEMA_STR}
 """
-    raw_text = _gemini_api_call(prompt)
-    data = _parse_gemini_response(raw_text, task_name)
-    
-    if data and data.get('aiBusinessOpportunity'):
-        for item in data['aiBusinessOpportunity']:
-            trend_link = item.get('trend_link')
-            # 只有当链接有效时才发送 None，否则 Notion 会因为空字符串报错
-            trend_link_value = trend_link if trend_link and trend_link.strip() else None 
-
-            # 使用英文 Field Name
-            biz_properties = {
-                "opportunity_title": { "title": [{"text": {"content": item.get('opportunity_title', 'N/A')}}] },
-                "description": { "rich_text": [{"text": {"content": item.get('description', 'N/A')}}] }, # 写入原始描述
-                "potential_market": { "rich_text": [{"text": {"content": item.get('potential_market', 'N/A')}}] },
-                "value_proposition": { "rich_text": [{"text": {"content": item.get('value_proposition', 'N/A')}}] },
-                "trend_reference": { "rich_text": [{"text": {"content": item.get('trend_reference', 'N/A')}}] },
-                "estimated_effort": { "rich_text": [{"text": {"content": item.get('estimated_effort', 'N/A')}}] },
-                # 修复: 写入 trend_link 属性，使用 URL 类型
-                "trend_link": { "url": trend_link_value },
-            }
-            _create_notion_page(NOTION_DB_AI_BUSINESS, biz_properties)
-    return data
 
-# --- HTML Email Formatting ---
+# AI Business Opportunity 的 Notion 属性规格
+_AI_BUSINESS_PROPERTIES = (
+    ("opportunity_title", _title, "opportunity_title"),
+    ("description", _rt, "description"), # 写入原始描述
+    ("potential_market", _rt, "potential_market"),
+    ("value_proposition", _rt, "value_proposition"),
+    ("trend_reference", _rt, "trend_reference"),
+    ("estimated_effort", _rt, "estimated_effort"),
+    # 修复: 写入 trend_link 属性，使用 URL 类型
+    ("trend_link", _url, "trend_link"),
+)
+
+# --- List Section Tasks (Steps 2-6) ---
+# 五个列表步骤只在提示词、Schema、目标数据库和属性映射上不同，统一由此表驱动 (按步骤顺序):
+# 数据键 -> (步骤名称, 提示词, responseSchema, Notion DB, 属性构建函数)
+_LIST_TASKS = {
+    'sreDynamics': ("SRE Dynamics", _SRE_DYNAMICS_PROMPT, _SRE_DYNAMICS_RESPONSE_SCHEMA, NOTION_DB_SRE_DYNAMICS, partial(_build_properties, _SRE_DYNAMICS_PROPERTIES)),
+    'failureIncidents': ("Failure Incidents", _FAILURE_INCIDENTS_PROMPT, _FAILURE_INCIDENTS_RESPONSE_SCHEMA, NOTION_DB_FAILURE_INCIDENTS, partial(_build_properties, _FAILURE_INCIDENT_PROPERTIES)),
+    'aiNews': ("AI News", _AI_NEWS_PROMPT, _AI_NEWS_RESPONSE_SCHEMA, NOTION_DB_AI_NEWS, partial(_build_properties, _AI_NEWS_PROPERTIES)),
+    'aiLearning': ("AI Learning", _AI_LEARNING_PROMPT, _AI_LEARNING_RESPONSE_SCHEMA, NOTION_DB_AI_LEARNING, partial(_build_properties, _AI_LEARNING_PROPERTIES)),
+    'aiBusinessOpportunity': ("AI Business Opportunity", _AI_BUSINESS_PROMPT, _AI_BUSINESS_RESPONSE_SCHEMA, NOTION_DB_AI_BUSINESS, partial(_build_properties, _AI_BUSINESS_PROPERTIES)),
+}
+
+def _usable_section_data(data_key, data):
+    """Validator for a list step: the response when its section has at least one valid item, else None."""
+    return data if _validate_section(data, data_key) else None
+
+def _run_list_task(data_key):
+    """Steps 2-6: fetches one list section from Gemini and returns its validated item list (written by main())."""
+    task_name, prompt, response_schema, _, _ = _LIST_TASKS[data_key]
+    data = _fetch_gemini_json(prompt, task_name, response_schema, partial(_usable_section_data, data_key))
+    return _validate_section(data, data_key)
+
+def _save_section(data_key, items):
+    """Queues one Notion page per validated item of a list section (created concurrently by the write pool)."""
+    _, _, _, db_id, build_properties = _LIST_TASKS[data_key]
+    if items and _notion_writable(db_id):
+        _create_notion_pages(db_id, [build_properties(item) for item in items])
+
+
+# --- Combined Mode: One Gemini Call for All Sections ---
+
+# 六个部分的 Schema 合并为一个 JSON 对象，共享一次联网搜索和一次请求往返
+_COMBINED_SCHEMA = {
+    "overallSummaryData": _REPORT_PROMPT_SCHEMA,
+    **_SRE_DYNAMICS_SCHEMA,
+    **_FAILURE_INCIDENTS_SCHEMA,
+    **_AI_NEWS_SCHEMA,
+    **_AI_LEARNING_SCHEMA,
+    **_AI_BUSINESS_SCHEMA,
+}
+_COMBINED_SCHEMA_STR = json.dumps(_COMBINED_SCHEMA, indent=4, ensure_ascii=False)
+_COMBINED_RESPONSE_SCHEMA = _to_response_schema(_COMBINED_SCHEMA)
+
+_COMBINED_PROMPT = f"""
+请根据可联网搜索到的过去一周（{REPORT_WEEK_START} 至 {REPORT_WEEK_END}）的信息，在一次回复中完成以下 6 项任务，并将结果合并到同一个 JSON 对象中返回：
+1. overallSummaryData: 生成周报的**标题**和**本周总体摘要**（overall_summary），周报的主题是全球 SRE 运维和人工智能领域。其中 'title'、'report_week_start' 和 'report_week_end' 请使用我提供的预设值。
+2. sreDynamics: 全球 SRE 和云原生领域的关键技术进展或最佳实践。
+3. failureIncidents: 过去一周发生的具有影响力的、公开披露的全球性服务故障。
+4. aiNews: 关于模型、算法、监管或硬件的重大 AI 前沿资讯。
+5. aiLearning: 值得推荐的最新的前沿学习资源，主题围绕 SRE、AIOps 或前沿 AI 技术，不限于网页、书本、视频。
+6. aiBusinessOpportunity: 基于当前 AI 技术的潜在商业化方向，预估投入使用 Low (低), Medium (中), High (高)。
 
-def _format_html_report(all_data):
-    """Format the complete analysis data into an HTML report for email."""
-    
-    # 提取顶层信息
-    report_week_start = all_data.get('overallSummaryData', {}).get('report_week_start', datetime.now().strftime('%Y-%m-%d'))
-    report_week_end = all_data.get('overallSummaryData', {}).get('report_week_end', datetime.now().strftime('%Y-%m-%d'))
-    report_title = all_data.get('overallSummaryData', {}).get('title', f"全球运维与 AI 周报 ({report_week_start} - {report_week_end})")
-    overall_summary = all_data.get('overallSummaryData', {}).get('overall_summary', 'N/A')
+**【强制约束】**
+1. **内容数量**: 第 2-6 项每项必须提供至少 3 条记录，理想是 5 条。
+2. **链接**: 每条记录的链接字段 (official_link、news_link、link、trend_link) 必须包含一个有效的 URL 链接，**不允许为空**。如果找不到链接，请不要返回该条记录。
 
-    def list_to_html(title, data_key, display_fields):
-        """Generates HTML table for lists from collected data."""
-        # display_fields 格式: {"中文表头": "英文 Field Name"}
-        items = all_data.get(data_key, [])
-        if not items: return ""
-        
-        html = f'<div class="section"><h2 class="section-title">{title}</h2><div class="table-container">'
-        html += '<table class="data-table"><thead><tr>'
-        for cn_header in display_fields.keys():
-            html += f'<th>{cn_header}</th>'
-        html += '</tr></thead><tbody>'
-        
-        for item in items:
-            html += '<tr>'
-            for cn_header, en_key in display_fields.items():
-                value = item.get(en_key, 'N/A')
-                
-                # 特殊处理链接字段 (包括新增的 trend_link)
-                if en_key in ['official_link', 'news_link', 'link', 'trend_link']: 
-                    # 只有当 value 不为空且是一个有效的 URL 时才显示链接
-                    value = f'<a href="{value}" target="_blank">查看链接</a>' if value and value.startswith('http') else 'N/A'
-                
-                # 针对多行富文本内容 (如 description, summary, root_cause), 将换行符转换为 <br>
-                elif en_key in ['description', 'summary', 'root_cause', 'overview', 'analysis_content', 'value_proposition']:
-                     if isinstance(value, str):
-                         value = value.replace('\n', '<br>')
-                
-                # 通用处理
-                elif isinstance(value, list):
-                    value = ", ".join(value)
-                
-                if cn_header in ['动态标题', '故障标题', '标题', '资源名称', '商机标题']:
-                    html += f'<td><strong>{value}</strong></td>'
-                else:
-                    html += f'<td>{value}</td>'
-            html += '</tr>'
-            
-        html += '</tbody></table></div></div>'
-        return html
+注意：'release_date'、'publish_date' 必须是 YYYY-MM-DD 格式；'incident_date' 必须是 ISO 8601 Timestamp 格式；'focus_areas'、'tags' 必须是逗号分隔的字符串。
+JSON 结构: {_COMBINED_SCHEMA_STR}
+"""
 
-    # 使用中文显示名称和英文 Field Name 映射
-    sre_dynamics_html = list_to_html("2. 运维行业动态 (SRE Dynamics)", 'sreDynamics', 
-                                     {"动态标题": "title", "摘要": "summary", "领域": "focus_areas", "链接": "official_link"})
+def _usable_combined_data(data):
+    """Validator for combined mode: the response when at least one of the six sections is usable, else None."""
+    if not isinstance(data, dict):
+        return None
+    summary_data = data.get('overallSummaryData')
+    if isinstance(summary_data, dict) and summary_data.get('overall_summary'):
+        return data
+    return data if any(_validate_section(data, data_key) for data_key in _LIST_TASKS) else None
+
+def _get_all_sections():
+    """Combined mode: fetches all six sections with ONE Gemini call and returns the usable ones."""
+    data = _fetch_gemini_json(_COMBINED_PROMPT, "Combined Report", _COMBINED_RESPONSE_SCHEMA, _usable_combined_data)
+    if not data:
+        return {}
     
-    failure_incidents_html = list_to_html("3. 全球故障信息 (Failure Incidents)", 'failureIncidents', 
-                                          {"故障标题": "incident_title", "公司": "company", "概览": "overview", "根因": "root_cause", "日期": "incident_date", "链接": "official_link"})
-
-    ai_news_html = list_to_html("4. AI 前沿资讯 (AI News)", 'aiNews',
-                                {"标题": "title", "摘要": "summary", "来源": "source", "类别": "category", "链接": "news_link"})
+    sections = {}
+    summary_data = _validate_summary(data.get('overallSummaryData'))
+    if summary_data:
+        _save_overall_summary(summary_data)
+        sections['overallSummaryData'] = summary_data
+    for data_key in _LIST_TASKS:
+        items = _validate_section(data, data_key) # 列表部分由 main() 在确认摘要可用后写入 Notion
+        if items:
+            sections[data_key] = items
+    return sections
 
-    ai_learning_html = list_to_html("5. AI 学习推荐 (AI Learning)", 'aiLearning',
-                                    {"资源名称": "material_name", "类型": "type", "难度": "difficulty", "推荐理由": "description", "链接": "link"})
-
-    # 修复：AI Business Opportunity 现在 trend_link 是独立字段
-    ai_business_html = list_to_html("6. AI 商业机会 (AI Business Opportunity)", 'aiBusinessOpportunity',
-                                    {"商机标题": "opportunity_title", "描述": "description", "潜在市场": "potential_market", "预估投入": "estimated_effort", "趋势链接": "trend_link"})
+# --- HTML Email Formatting ---
 
+# 邮件样式表，导入时定义一次
+_HTML_CSS = """
+            body { font-family: 'Inter', sans-serif; margin: 0; padding: 20px; background-color: #f4f7f6; color: #333; }
+            .container { max-width: 900px; margin: 0 auto; background-color: #ffffff; border-radius: 12px; box-shadow: 0 4px 20px rgba(0, 0, 0, 0.05); padding: 30px; }
+            .header { text-align: center; border-bottom: 2px solid #e0e0e0; padding-bottom: 20px; margin-bottom: 20px; }
+            .header h1 { font-size: 28px; color: #1a1a1a; margin: 0; }
+            .header p { color: #777; font-size: 14px; margin-top: 5px; }
+            .section { margin-bottom: 30px; }
+            .section-title { font-size: 22px; color: #3498db; border-left: 4px solid #3498db; padding-left: 10px; margin-bottom: 15px; font-weight: bold; }
+            .content p { line-height: 1.8; font-size: 16px; }
+            .data-table { width: 100%; border-collapse: collapse; margin-top: 10px; }
+            .data-table th, .data-table td { padding: 10px; border: 1px solid #e0e0e0; text-align: left; font-size: 13px; vertical-align: top; }
+            .data-table th { background-color: #f0f0f0; font-weight: 600; }
+            .data-table tr:nth-child(even) { background-color: #fafafa; }
+            .table-container { overflow-x: auto; }
+            a { color: #3498db; text-decoration: none; }
+"""
 
-    html_content = f"""
+# 报告头部 (含样式与总体摘要) 和尾部；头部用 string.Template，样式中的花括号无需转义
+_REPORT_HEAD_TPL = string.Template("""
     <!DOCTYPE html>
     <html>
     <head>
-        <title>{report_title}</title>
+        <title>$report_title</title>
         <meta charset="utf-8">
-        <style>
-            body {{ font-family: 'Inter', sans-serif; margin: 0; padding: 20px; background-color: #f4f7f6; color: #333; }}
-            .container {{ max-width: 900px; margin: 0 auto; background-color: #ffffff; border-radius: 12px; box-shadow: 0 4px 20px rgba(0, 0, 0, 0.05); padding: 30px; }}
-            .header {{ text-align: center; border-bottom: 2px solid #e0e0e0; padding-bottom: 20px; margin-bottom: 20px; }}
-            .header h1 {{ font-size: 28px; color: #1a1a1a; margin: 0; }}
-            .header p {{ color: #777; font-size: 14px; margin-top: 5px; }}
-            .section {{ margin-bottom: 30px; }}
-            .section-title {{ font-size: 22px; color: #3498db; border-left: 4px solid #3498db; padding-left: 10px; margin-bottom: 15px; font-weight: bold; }}
-            .content p {{ line-height: 1.8; font-size: 16px; }}
-            .data-table {{ width: 100%; border-collapse: collapse; margin-top: 10px; }}
-            .data-table th, .data-table td {{ padding: 10px; border: 1px solid #e0e0e0; text-align: left; font-size: 13px; vertical-align: top; }}
-            .data-table th {{ background-color: #f0f0f0; font-weight: 600; }}
-            .data-table tr:nth-child(even) {{ background-color: #fafafa; }}
-            .table-container {{ overflow-x: auto; }}
-            a {{ color: #3498db; text-decoration: none; }}
-        </style>
+        <style>$css        </style>
     </head>
     <body>
         <div class="container">
             <div class="header">
-                <h1>{report_title}</h1>
-                <p>覆盖日期: {report_week_start} - {report_week_end} | 由 Gemini AI 驱动</p>
+                <h1>$report_title</h1>
+                <p>覆盖日期: $report_week_start - $report_week_end | 由 Gemini AI 驱动</p>
             </div>
 
             <div class="section">
                 <h2 class="section-title">1. 本周总体摘要 (Overall Summary)</h2>
                 <div class="content">
-                    <p>{overall_summary}</p>
+                    <p>$overall_summary</p>
                 </div>
             </div>
 
-            {sre_dynamics_html}
-            {failure_incidents_html}
-            {ai_news_html}
-            {ai_learning_html}
-            {ai_business_html}
+            """)
+# 样式表是常量，导入时先代入头部模板 (其中的 '$' 需转义)，生成报告时只替换标题、日期和摘要
+_REPORT_HEAD_TPL = string.Template(_REPORT_HEAD_TPL.safe_substitute(css=_HTML_CSS.replace('$', '$$')))
+_REPORT_SECTION_SEPARATOR = "\n            "
+_REPORT_TAIL_HTML = """
 
             <div class="section">
                 <p style="text-align: center; color: #999; font-size: 12px; margin-top: 40px;">
@@ -628,14 +1290,133 @@ def _format_html_report(all_data):
     </body>
     </html>
     """
-    return html_content
 
-def main():
-    """Main function to orchestrate the sequential process."""
+# 表格片段模板在导入时定义一次；list_to_html 将片段依次写入报告缓冲区
+_TABLE_OPEN_TPL = '<div class="section"><h2 class="section-title">{title}</h2><div class="table-container"><table class="data-table"><thead><tr>'
+_TABLE_CLOSE_HTML = '</tbody></table></div></div>'
+_TH_TPL = '<th>{}</th>'
+_TD_TPL = '<td>{}</td>'
+_TD_STRONG_TPL = '<td><strong>{}</strong></td>'
+_LINK_TPL = '<a href="{}" target="_blank">查看链接</a>'
+
+# 单元格分类用的字段/表头集合 (哈希查找)
+_LINK_KEYS = frozenset({'official_link', 'news_link', 'link', 'trend_link'})
+_RICHTEXT_KEYS = frozenset({'description', 'summary', 'root_cause', 'overview', 'analysis_content', 'value_proposition'})
+_TITLE_HEADERS = frozenset({'动态标题', '故障标题', '标题', '资源名称', '商机标题'})
+
+# 各列表部分的显示列: (中文表头, 英文 Field Name)
+_SRE_FIELDS = (("动态标题", "title"), ("摘要", "summary"), ("领域", "focus_areas"), ("链接", "official_link"))
+_INCIDENT_FIELDS = (("故障标题", "incident_title"), ("公司", "company"), ("概览", "overview"), ("根因", "root_cause"), ("日期", "incident_date"), ("链接", "official_link"))
+_AI_NEWS_FIELDS = (("标题", "title"), ("摘要", "summary"), ("来源", "source"), ("类别", "category"), ("链接", "news_link"))
+_AI_LEARNING_FIELDS = (("资源名称", "material_name"), ("类型", "type"), ("难度", "difficulty"), ("推荐理由", "description"), ("链接", "link"))
+# 修复：AI Business Opportunity 现在 trend_link 是独立字段
+_AI_BUSINESS_FIELDS = (("商机标题", "opportunity_title"), ("描述", "description"), ("潜在市场", "potential_market"), ("预估投入", "estimated_effort"), ("趋势链接", "trend_link"))
+
+def _table_head_html(title, columns):
+    """Static table opening (section title + header row) for one report section."""
+    return "".join([
+        _TABLE_OPEN_TPL.format(title=title),
+        *(_TH_TPL.format(cn_header) for cn_header, _ in columns),
+        '</tr></thead><tbody>',
+    ])
+
+# (数据键, 显示列, 预先生成的表头 HTML)：表头只依赖常量，导入时拼接一次
+_REPORT_SECTIONS = tuple(
+    (data_key, columns, _table_head_html(title, columns))
+    for title, data_key, columns in (
+        ("2. 运维行业动态 (SRE Dynamics)", 'sreDynamics', _SRE_FIELDS),
+        ("3. 全球故障信息 (Failure Incidents)", 'failureIncidents', _INCIDENT_FIELDS),
+        ("4. AI 前沿资讯 (AI News)", 'aiNews', _AI_NEWS_FIELDS),
+        ("5. AI 学习推荐 (AI Learning)", 'aiLearning', _AI_LEARNING_FIELDS),
+        ("6. AI 商业机会 (AI Business Opportunity)", 'aiBusinessOpportunity', _AI_BUSINESS_FIELDS),
+    )
+)
+
+def _format_html_report(all_data):
+    """Format the complete analysis data into an HTML report for email."""
+    
+    # 提取顶层信息
+    report_week_start = all_data.get('overallSummaryData', {}).get('report_week_start', REPORT_WEEK_START)
+    report_week_end = all_data.get('overallSummaryData', {}).get('report_week_end', REPORT_WEEK_END)
+    report_title = all_data.get('overallSummaryData', {}).get('title', f"全球运维与 AI 周报 ({report_week_start} - {report_week_end})")
+    overall_summary = all_data.get('overallSummaryData', {}).get('overall_summary', 'N/A')
+
+    # 报告各片段依次写入同一个缓冲区，最后一次性取出
+    buf = io.StringIO()
+
+    def list_to_html(data_key, columns, table_head):
+        """Writes the HTML table for one list section into buf, one joined row at a time."""
+        items = all_data.get(data_key, [])
+        if not items: return
+        
+        buf.write(table_head)
+        for item in items:
+            cells = ['<tr>']
+            for cn_header, en_key in columns:
+                value = item.get(en_key, 'N/A')
+                if isinstance(value, list):
+                    value = ", ".join(map(str, value))
+                # AI 返回的内容一律转义后再嵌入 HTML，防止其中的标签或脚本被邮件客户端渲染
+                value = html.escape(str(value))
+                
+                # 特殊处理链接字段 (包括新增的 trend_link)
+                if en_key in _LINK_KEYS:
+                    # 只有当 value 不为空且是一个有效的 URL 时才显示链接
+                    value = _LINK_TPL.format(value) if value.startswith('http') else 'N/A'
+                
+                # 针对多行富文本内容 (如 description, summary, root_cause), 将换行符转换为 <br>
+                elif en_key in _RICHTEXT_KEYS:
+                    value = value.replace('\n', '<br>')
+                
+                cell_tpl = _TD_STRONG_TPL if cn_header in _TITLE_HEADERS else _TD_TPL
+                cells.append(cell_tpl.format(value))
+            cells.append('</tr>')
+            buf.write("".join(cells))
+            
+        buf.write(_TABLE_CLOSE_HTML)
+
+    buf.write(_REPORT_HEAD_TPL.substitute(
+        report_title=html.escape(report_title),
+        report_week_start=report_week_start,
+        report_week_end=report_week_end,
+        overall_summary=html.escape(overall_summary),
+    ))
+    for index, (data_key, columns, table_head) in enumerate(_REPORT_SECTIONS):
+        if index:
+            buf.write(_REPORT_SECTION_SEPARATOR)
+        list_to_html(data_key, columns, table_head)
+    buf.write(_REPORT_TAIL_HTML)
+    return buf.getvalue()
+
+def _validate_config():
+    """Checks the environment before any network call; returns True when email can be delivered."""
+    required = [("GEMINI_API_KEY", GEMINI_API_KEY), ("NOTION_TOKEN", NOTION_TOKEN)]
+    missing = [name for name, value in required if not value]
+    if missing:
+        print(f"Required API keys/tokens are missing ({', '.join(missing)}). Aborting.")
+        raise SystemExit(1)
+    
+    optional = [
+        ("NOTION_DB_REPORT", NOTION_DB_REPORT),
+        ("NOTION_DB_SRE_DYNAMICS", NOTION_DB_SRE_DYNAMICS),
+        ("NOTION_DB_FAILURE_INCIDENTS", NOTION_DB_FAILURE_INCIDENTS),
+        ("NOTION_DB_AI_NEWS", NOTION_DB_AI_NEWS),
+        ("NOTION_DB_AI_LEARNING", NOTION_DB_AI_LEARNING),
+        ("NOTION_DB_AI_BUSINESS", NOTION_DB_AI_BUSINESS),
+        ("SENDGRID_API_KEY", SENDGRID_API_KEY),
+        ("GMAIL_RECIPIENT_EMAILS", GMAIL_RECIPIENT_EMAILS),
+    ]
+    for name, value in optional:
+        if not value:
+            print(f"Warning: {name} is not set.")
+    return bool(SENDGRID_API_KEY and GMAIL_RECIPIENT_EMAILS)
+
+def main(force=False):
+    """Main function: collects all sections, writes them to Notion and emails the report."""
+    global _force_notion_writes
+    _force_notion_writes = force # True 时即使之前的运行已写入相同页面也重新创建
     print("Starting the SRE/AI weekly report generation...")
-    if not GEMINI_API_KEY or not NOTION_TOKEN:
-        print("Required API keys/tokens are missing. Aborting.")
-        return
+    email_enabled = _validate_config()
 
     # Dictionary to hold all collected data for the final email report
     all_report_data = {
@@ -647,54 +1428,82 @@ def main():
         'aiBusinessOpportunity': []
     }
     
-    # --- Step 1: Get Overall Summary & Report Date (Mandatory First Step) ---
-    print("\n--- Step 1/6: Getting Overall Summary and Report Date (Report Master) ---")
-    summary_data = _get_overall_summary()
-    if not summary_data:
-        print("Fatal: Could not get Overall Summary. Aborting all subsequent steps.")
-        return
-    
-    all_report_data['overallSummaryData'] = summary_data
-    print("Step 1 Complete: Report Master page creation attempted.")
-
-    # --- Step 2 to 6: Sequential Data Collection and Saving ---
+    # 列表部分在 Overall Summary 获取成功前不写入 Notion：摘要失败时不留下没有主报告页的条目
+    unsaved_sections = []
+
+    def save_ready_sections():
+        if all_report_data['overallSummaryData']:
+            while unsaved_sections:
+                data_key = unsaved_sections.pop()
+                _save_section(data_key, all_report_data[data_key])
+
+    # --- Combined Mode (default): All 6 Sections in One Gemini Call ---
+    combined_failures = {}
+    if GEMINI_COMBINED_PROMPT:
+        print("\n--- Combined Mode: Getting all 6 sections with a single Gemini call ---")
+        sections = _get_all_sections()
+        all_report_data.update(sections)
+        unsaved_sections.extend(data_key for data_key in sections if data_key in _LIST_TASKS)
+        save_ready_sections()
+        # 合并调用的失败先不计入摘要：逐步回退补齐全部内容时报告仍是成功的
+        combined_failures = _take_failures()
+        missing = [data_key for data_key, section in all_report_data.items() if not section]
+        if missing:
+            print(f"Combined Mode: sections missing, falling back to per-step calls: {', '.join(missing)}")
+
+    # --- Step 1 to 6: Concurrent Data Collection and Saving ---
+    # 报告周期取自统一的运行时间戳，步骤 2-6 不依赖 Step 1 的结果，因此六个步骤全部并发获取，
+    # 总耗时从 "Step 1 + 最慢的后续步骤" 降为 "最慢步骤的耗时"；列表部分的写入仍等待 Step 1 成功
+    all_steps = [('overallSummaryData', "Overall Summary", _get_overall_summary, NOTION_DB_REPORT)]
+    all_steps += [
+        (data_key, task_name, partial(_run_list_task, data_key), db_id)
+        for data_key, (task_name, _, _, db_id, _) in _LIST_TASKS.items()
+    ]
+    concurrent_steps = []
+    for data_key, step_name, fetch_step, db_id in all_steps:
+        if all_report_data[data_key]:
+            continue # 合并模式下已获取的部分不再重复请求
+        if not db_id and not email_enabled and data_key != 'overallSummaryData':
+            # 既不写入 Notion 也不发送邮件时，该步骤的结果无处可用，直接跳过 Gemini 调用
+            print(f"Skipping {step_name}: no Notion DB and no email configured.")
+            continue
+        concurrent_steps.append((data_key, step_name, fetch_step))
+    if concurrent_steps:
+        print(f"\n--- Steps 1-6/6: Getting {len(concurrent_steps)} sections concurrently ---")
+        with ThreadPoolExecutor(max_workers=len(concurrent_steps)) as executor:
+            futures = {
+                executor.submit(fetch_step): (data_key, step_name)
+                for data_key, step_name, fetch_step in concurrent_steps
+            }
+            for future in as_completed(futures):
+                data_key, step_name = futures[future]
+                try:
+                    step_data = future.result()
+                except Exception as e:
+                    print(f"Step {step_name} failed unexpectedly: {e}")
+                    continue
+                # Step 1 返回校验后的摘要对象，其余步骤返回校验后的条目列表
+                if step_data:
+                    all_report_data[data_key] = step_data
+                    if data_key in _LIST_TASKS:
+                        unsaved_sections.append(data_key)
+                    save_ready_sections()
+                print(f"Step Complete: {step_name}.")
     
-    # 2. SRE Dynamics
-    print("\n--- Step 2/6: Getting SRE Dynamics ---")
-    sre_data = _get_sre_dynamics()
-    if sre_data and sre_data.get('sreDynamics'):
-        all_report_data['sreDynamics'] = sre_data['sreDynamics']
-    print("Step 2 Complete.")
-
-    # 3. Failure Incidents
-    print("\n--- Step 3/6: Getting Failure Incidents ---")
-    incident_data = _get_failure_incidents()
-    if incident_data and incident_data.get('failureIncidents'):
-        all_report_data['failureIncidents'] = incident_data['failureIncidents']
-    print("Step 3 Complete.")
-
-    # 4. AI News
-    print("\n--- Step 4/6: Getting AI News ---")
-    ai_news_data = _get_ai_news()
-    if ai_news_data and ai_news_data.get('aiNews'):
-        all_report_data['aiNews'] = ai_news_data['aiNews']
-    print("Step 4 Complete.")
-
-    # 5. AI Learning
-    print("\n--- Step 5/6: Getting AI Learning ---")
-    ai_learning_data = _get_ai_learning()
-    if ai_learning_data and ai_learning_data.get('aiLearning'):
-        all_report_data['aiLearning'] = ai_learning_data['aiLearning']
-    print("Step 5 Complete.")
-
-    # 6. AI Business Opportunity
-    print("\n--- Step 6/6: Getting AI Business Opportunity ---")
-    ai_biz_data = _get_ai_business()
-    if ai_biz_data and ai_biz_data.get('aiBusinessOpportunity'):
-        all_report_data['aiBusinessOpportunity'] = ai_biz_data['aiBusinessOpportunity']
-    print("Step 6 Complete.")
+    if combined_failures:
+        if all(all_report_data.values()):
+            print(f"Combined call failures not reported: per-step fallback completed the report ({', '.join(combined_failures)}).")
+        else:
+            _restore_failures(combined_failures)
+
+    if not all_report_data['overallSummaryData']:
+        print("Fatal: Could not get Overall Summary. Sending failure report instead.")
+        if unsaved_sections:
+            print(f"Skipping Notion writes without a Report Master page: {', '.join(unsaved_sections)}")
     
     # --- Final Step: Send Email Notification ---
+    # 邮件内容只依赖已获取的数据，不依赖 Notion 写入结果：报告在后台邮件线程发送，
+    # 与仍在进行的 Notion 写入并行，最后统一等待两者完成
     print("\n--- Final Step: Formatting and sending email notification ---")
     
     # 检查是否成功获取了主报告数据
@@ -705,9 +1514,18 @@ def main():
         html_report = _format_html_report(all_report_data)
         subject = all_report_data['overallSummaryData'].get('title', "SRE/AI 周报")
     
-    send_email_notification(GMAIL_RECIPIENT_EMAILS, f"【周报】{subject}", html_report)
+    report_email = _EMAIL_POOL.submit(send_email_notification, GMAIL_RECIPIENT_EMAILS, f"【周报】{subject}", html_report)
+    _wait_for_notion_writes()
+    report_email.result()
     
     print("\nScript finished. All available data has been processed and notified.")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Generate the weekly SRE/AI report.")
+    parser.add_argument("--force", action="store_true", help="re-create Notion pages already written by an earlier run")
+    args = parser.parse_args()
+    try:
+        main(force=args.force)
+    finally:
+        # 运行期间记录的所有失败合并为一封邮件，在进程退出前发送
+        _send_failure_digest()
@@ -0,0 +1,23 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from sre_ai_report_generator import _extract_json_object
+
+
+class ExtractJsonObjectTest(unittest.TestCase):
+    def test_fenced_object(self):
+        self.assertEqual(_extract_json_object('Here:\n```json\n{"a": 1}\n```'), {"a": 1})
+
+    def test_fence_after_object(self):
+        self.assertEqual(_extract_json_object('{"a": 1}\n\nSources:\n```\nhttps://x\n```'), {"a": 1})
+        self.assertEqual(_extract_json_object('\n{"a":{"b":2}}\n```note```'), {"a": {"b": 2}})
+
+    def test_truncated_object_is_rejected(self):
+        self.assertIsNone(_extract_json_object('{"aiNews": [{"title": "x"}, {"title": "y"'))
+
+
+if __name__ == "__main__":
+    unittest.main()